@@ -85,13 +85,40 @@ rst_epilog = """
 
 .. |Polygon| replace:: :class:`Polygon3.Polygon`
 .. |array| replace:: :class:`array <numpy.ndarray>`
+.. |dtype| replace:: :class:`dtype <numpy.dtype>`
+.. |Batch| replace:: :class:`~pyglet.graphics.Batch`
 
 .. |Shape| replace:: :class:`~pyglet2d.Shape`
 .. |Shape.circle| replace:: :meth:`~pyglet2d.Shape.circle`
 .. |Shape.rectangle| replace:: :meth:`~pyglet2d.Shape.rectangle`
 .. |Shape.regular_polygon| replace:: :meth:`~pyglet2d.Shape.regular_polygon`
 .. |Shape.from_dict| replace:: :meth:`~pyglet2d.Shape.from_dict`
+.. |Shape.from_dicts| replace:: :meth:`~pyglet2d.Shape.from_dicts`
+.. |Shape.save_scene| replace:: :meth:`~pyglet2d.Shape.save_scene`
+.. |Shape.load_scene| replace:: :meth:`~pyglet2d.Shape.load_scene`
 .. |Shape.scale| replace:: :meth:`~pyglet2d.Shape.scale`
 .. |Shape.translate| replace:: :meth:`~pyglet2d.Shape.translate`
+.. |Shape.rotate| replace:: :meth:`~pyglet2d.Shape.rotate`
+.. |Shape.transform| replace:: :meth:`~pyglet2d.Shape.transform`
+.. |Shape.update| replace:: :meth:`~pyglet2d.Shape.update`
+.. |Shape.draw| replace:: :meth:`~pyglet2d.Shape.draw`
+
+.. |Shape.overlaps| replace:: :meth:`~pyglet2d.Shape.overlaps`
+.. |Shape.union_all| replace:: :meth:`~pyglet2d.Shape.union_all`
+.. |Shape.boolean_cache| replace:: :attr:`~pyglet2d.Shape.boolean_cache`
+.. |BooleanCache| replace:: :class:`~pyglet2d.BooleanCache`
+.. |ShapeBatch| replace:: :class:`~pyglet2d.ShapeBatch`
+.. |MotionSystem| replace:: :class:`~pyglet2d.MotionSystem`
+.. |InstancedShape| replace:: :class:`~pyglet2d.InstancedShape`
+.. |FrameStats| replace:: :class:`~pyglet2d.FrameStats`
+.. |FrameStats.end_frame| replace:: :meth:`~pyglet2d.FrameStats.end_frame`
+.. |Shape.collide| replace:: :meth:`~pyglet2d.Shape.collide`
+.. |Shape.time_of_impact| replace:: :meth:`~pyglet2d.Shape.time_of_impact`
+
+.. |SpatialIndex.update| replace:: :meth:`~pyglet2d.SpatialIndex.update`
+.. |MotionSystem.update| replace:: :meth:`~pyglet2d.MotionSystem.update`
+.. |MotionSystem.remove_many| replace:: :meth:`~pyglet2d.MotionSystem.remove_many`
+.. |Simulation.update| replace:: :meth:`~pyglet2d.Simulation.update`
+.. |Simulation.draw| replace:: :meth:`~pyglet2d.Simulation.draw`
 
 """
@@ -1,16 +1,161 @@
 __version__ = '0.2.1'
 
-from itertools import chain
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import ctypes
+import json
+import math
+import operator
+import os
+import struct
+import time
+from functools import lru_cache, wraps
+from itertools import count
+from types import MappingProxyType
 
 import numpy as np
-import pyglet
 from Polygon import Polygon, setDataStyle, STYLE_NUMPY
-from Polygon.Utils import pointList as point_list
 
 
 setDataStyle(STYLE_NUMPY)
 
 
+def _pyglet():
+    """Import pyglet when it is first needed, since the import is slow and not needed for geometry alone.
+
+    """
+    import pyglet
+    return pyglet
+
+
+def _instrumented(category):
+    """Decorate a method so that its calls are counted and timed in ``Shape.stats``, if it is set.
+
+    The wrapper costs a function call even when instrumentation is disabled,
+    so methods that are cheap and called often (per shape per frame) check ``stats`` themselves instead.
+
+    """
+    def decorator(method):
+        @wraps(method)
+        def instrumented(*args, **kwargs):
+            stats = Shape.stats
+            if stats is None:
+                return method(*args, **kwargs)
+            start = stats.clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                stats.record(category, start)
+        return instrumented
+    return decorator
+
+
+# The bounds of an empty shape: an inverted box, which does not intersect any other.
+_EMPTY_BOUNDS = np.array([[np.inf, np.inf], [-np.inf, -np.inf]])
+_EMPTY_BOUNDS.flags.writeable = False
+
+# The model matrix of a shape whose vertex list is up to date.
+_IDENTITY = np.eye(3)
+_IDENTITY.flags.writeable = False
+
+# Points are compared with other points or edges in chunks, so that pairwise arrays hold about this many pairs at most.
+_MAX_PAIRS = 1000000
+
+# The linear part of a translation, as composed for cached properties.
+_LINEAR_IDENTITY = np.eye(2)
+_LINEAR_IDENTITY.flags.writeable = False
+
+# Geometry versions are drawn from one counter so that they are unique across all shapes,
+# except that copies share the version of their original until either is modified.
+# Thus shapes with the same version have the same geometry.
+_versions = count()
+
+
+@lru_cache(maxsize=4096)
+def _palette(color):
+    """A read-only ``{'primary': color}`` palette, shared by single-color shapes with the same color.
+
+    """
+    return MappingProxyType({'primary': color})
+
+
+@lru_cache(maxsize=None)
+def _unit_circle(n_vertices):
+    """Vertices of a regular polygon around the origin with radius 1, starting on the x axis.
+
+    The result is shared by all circles with the same number of vertices, so it is read-only.
+
+    """
+    angles = np.arange(n_vertices) * 2 * np.pi / n_vertices
+    points = np.array([np.cos(angles), np.sin(angles)]).T
+    points.flags.writeable = False
+    return points
+
+
+def _circle_vertex_count(radius, tolerance, min_vertices, max_vertices):
+    """The number of vertices for a circle whose edges stray at most `tolerance` from the true circle.
+
+    Counts are powers of two (so that tessellations are shared, and small changes in radius do not change the count),
+    clipped to `min_vertices` and `max_vertices`.
+
+    """
+    # A chord spanning an angle of 2 * pi / n lies at most radius * (1 - cos(pi / n)) inside the circle.
+    if tolerance < radius:
+        n_vertices = math.pi / math.acos(1 - tolerance / radius)
+    else:
+        n_vertices = 3
+    n_vertices = 2 ** math.ceil(math.log2(n_vertices))
+    return min(max(n_vertices, min_vertices), max_vertices)
+
+
+def _similarity_scale(matrix):
+    """The scale factor of a 2x2 matrix that preserves circles (a rotation, flip and uniform scaling), otherwise None.
+
+    """
+    (a, b), (c, d) = matrix.tolist()
+    x_scale, y_scale = math.hypot(a, c), math.hypot(b, d)
+    if math.isclose(x_scale, y_scale, rel_tol=1e-5, abs_tol=1e-8) and abs(a * b + c * d) <= 1e-8:
+        return x_scale
+    return None
+
+
+def _set_indices(vertex_list, indices):
+    """Set the indices of a vertex list, which pyglet stores relative to the start of the vertex domain.
+
+    """
+    start = vertex_list.start
+    vertex_list.indices = [index + start for index in indices]
+
+
+@lru_cache(maxsize=None)
+def _fan_indices(n_vertices):
+    """Indices of a triangle fan around vertex 0, through vertices 1 to `n_vertices`.
+
+    The result is shared by all shapes with the same number of vertices, so it is immutable.
+
+    """
+    indices = np.zeros((n_vertices, 3), dtype=int)
+    indices[:, 1] = np.arange(1, n_vertices + 1)
+    indices[:, 2] = np.roll(indices[:, 1], -1)
+    return tuple(indices.ravel().tolist())
+
+
+def _is_convex(points):
+    """Check whether a single contour is convex, i.e., whether it turns once, always in the same direction.
+
+    """
+    if len(points) < 4:
+        return True
+    edges = np.roll(points, -1, axis=0) - points
+    following = np.roll(edges, -1, axis=0)
+    cross = edges[:, 0] * following[:, 1] - edges[:, 1] * following[:, 0]
+    tolerance = 1e-9 * np.abs(cross).max()
+    if np.any(cross > tolerance) and np.any(cross < -tolerance):
+        return False
+    turning = np.arctan2(cross, np.sum(edges * following, axis=1)).sum()
+    return bool(np.isclose(abs(turning), 2 * np.pi))
+
+
 class Shape:
     """Graphical polygon primitive for use with `pyglet`_.
 
@@ -40,9 +185,27 @@ class Shape:
     Attributes
     ----------
     poly : |Polygon|
-        Associated |Polygon| object.
+        A copy of the shape as a |Polygon| object, for other |Polygon| methods.
+        Each access returns a new copy, so modifying it does not modify the shape.
     vertices : |array|
         An array of points, with x and y columns. Read-only.
+        This is a view of the shape's storage, not a copy: it changes when the shape is transformed in-place.
+        Call ``copy()`` on it to keep the current vertices.
+        The view of a |MotionSystem| member is only valid until shapes are added to or removed from the system,
+        which may move its storage; access ``vertices`` again after that.
+    boolean_cache : |BooleanCache| or None
+        Class attribute. If set, results of the boolean operators ``&``, ``|``, ``^``, ``+``, and ``-`` between shapes
+        are cached in it, and repeated operations on unmodified shapes return copies of the cached results.
+        None (no caching) by default.
+    stats : |FrameStats| or None
+        Class attribute. If set, the work done by pyglet2d is counted and timed in it.
+        None (no instrumentation) by default.
+    min_circle_vertices, max_circle_vertices : int
+        Class attributes, the range of vertex counts for circles with adaptive level of detail.
+    dtype : |dtype|
+        Class attribute, the data type of `vertices`.
+        Set to ``numpy.float32`` in a subclass to halve vertex storage (and skip a conversion when drawing),
+        at the cost of precision.
     center : |array|
         The centroid of the shape.
         Setting center calls |Shape.translate|.
@@ -51,40 +214,84 @@ class Shape:
     radius : |array|
         Mean distance from each point to the center.
         Setting radius calls |Shape.scale|.
+    bounds : |array|
+        The bounding box aligned with the screen axes, as ``[[x_min, y_min], [x_max, y_max]]``. Read-only.
+        Empty shapes (e.g., the intersection of disjoint shapes) have the inverted bounds
+        ``[[inf, inf], [-inf, -inf]]``, which do not intersect any other.
+    bounding_circle : tuple
+        A ``(center, radius)`` pair describing a circle around `center` that contains the shape.
     color : str or tuple of int
         The current color, in R, G, B format if `colors` was not passed.
         Otherwise, the current color is represented as a key in `colors`.
     colors : dict of tuple
         Named colors.
+        If `colors` was not passed, this is a read-only palette shared with other shapes of the same color;
+        set `color` to change it.
     velocity : |array|
         Speed and direction of linear motion.
+        This is a view of the shape's motion state (shared with a |MotionSystem| it belongs to), not a copy:
+        assigning to `velocity` copies the new values into it, so an array read from `velocity` earlier changes too.
+        Call ``copy()`` on it to keep the current velocity.
     Angular_velocity : float
         Speed of angular motion, in counter-clockwise radians per second.
     enabled : bool
         If False, the shape will not be drawn.
 
     """
+    dtype = np.float64
+    boolean_cache = None
+    stats = None
+    min_circle_vertices = 8
+    max_circle_vertices = 4096
+
+    # Shapes are often created by the thousand, so they have no per-instance __dict__.
+    __slots__ = ('_points', '_contours', '_poly', '_poly_version', '_triangulation', 'colors', '_color', '_motion',
+                 '_geometry_version', '_cache_version', '_cache_anchor', '_pending_matrix', '_cached_center',
+                 '_cached_bounds', '_cached_bounding_radius',
+                 '_allocated_vertex_list', '_uploaded_geometry_version', '_uploaded_color', '_model', '_tolerance',
+                 'enabled', '__weakref__')
+
     def __init__(self, vertices, color=(255, 255, 255), velocity=(0, 0), angular_velocity=0, colors=None):
+        self._poly = None
         if isinstance(vertices, Polygon):
-            self.poly = vertices
+            # Copy the polygon, so that the caller cannot modify the shape through it.
+            self._set_polygon(Polygon(vertices))
         else:
-            self.poly = Polygon(vertices)
+            self._points = np.array(vertices, dtype=self.dtype).reshape(-1, 2)
+            self._contours = None
+            self._triangulation = None
 
+        self._set_attributes(color, velocity, angular_velocity, colors)
+
+        # Construct vertex_list.
+        self._geometry_version = next(_versions)
+        if self._poly is not None:
+            self._poly_version = self._geometry_version
+        self._cache_version = None
+        self._pending_matrix = None
+        # The vertex list is created when first drawn.
+        self._allocated_vertex_list = None
+        self._model = None
+        self._tolerance = None
+        self.enabled = True
+
+    def _set_attributes(self, color=(255, 255, 255), velocity=(0, 0), angular_velocity=0, colors=None):
+        """Set the attributes other than the geometry, as the constructor does.
+
+        """
         self.colors = colors
         self._color = 'primary'
         if colors:
             self.color = color
 
         else:
-            self.colors = {'primary': color}
+            self.colors = _palette(tuple(color))
 
-        self.velocity = np.asarray(velocity)
+        # Linear and angular velocity share one buffer, so that a MotionSystem can substitute a view of its own.
+        self._motion = np.zeros(3)
+        self.velocity = velocity
         self.angular_velocity = angular_velocity
 
-        # Construct vertex_list.
-        self._vertex_list = self._get_vertex_list()
-        self.enabled = True
-
     @classmethod
     def regular_polygon(cls, center, radius, n_vertices, start_angle=0, **kwargs):
         """Construct a regular polygon.
@@ -101,11 +308,13 @@ class Shape:
             Other keyword arguments are passed to the |Shape| constructor.
 
         """
-        angles = (np.arange(n_vertices) * 2 * np.pi / n_vertices) + start_angle
-        return cls(center + radius * np.array([np.cos(angles), np.sin(angles)]).T, **kwargs)
+        if start_angle:
+            angles = (np.arange(n_vertices) * 2 * np.pi / n_vertices) + start_angle
+            return cls(center + radius * np.array([np.cos(angles), np.sin(angles)]).T, **kwargs)
+        return cls(center + radius * _unit_circle(n_vertices), **kwargs)
 
     @classmethod
-    def circle(cls, center, radius, n_vertices=50, **kwargs):
+    def circle(cls, center, radius, n_vertices=50, tolerance=None, **kwargs):
         """Construct a circle.
 
         Parameters
@@ -115,11 +324,24 @@ class Shape:
         n_vertices : int, optional
             Number of points to draw.
             Decrease for performance, increase for appearance.
+            Ignored if `tolerance` is passed.
+        tolerance : float, optional
+            If passed, the number of vertices is chosen so that the edges are at most this far from the true circle
+            (e.g., 0.5 for half a pixel when drawing in window coordinates),
+            and chosen again whenever the circle is scaled enough to need more or fewer vertices.
+            The number of vertices is a power of two,
+            between the class attributes ``min_circle_vertices`` and ``max_circle_vertices``.
+            Scaling the circle unevenly makes it an ordinary shape with a fixed number of vertices.
         kwargs
             Other keyword arguments are passed to the |Shape| constructor.
 
         """
-        return cls.regular_polygon(center, radius, n_vertices, **kwargs)
+        if tolerance is None:
+            return cls.regular_polygon(center, radius, n_vertices, **kwargs)
+        n_vertices = _circle_vertex_count(radius, tolerance, cls.min_circle_vertices, cls.max_circle_vertices)
+        circle = cls.regular_polygon(center, radius, n_vertices, **kwargs)
+        circle._tolerance = tolerance
+        return circle
 
     @classmethod
     def rectangle(cls, vertices, **kwargs):
@@ -164,9 +386,354 @@ class Shape:
 
         return cls(vertices, **spec)
 
+    @classmethod
+    def from_dicts(cls, specs, chunk_size=1024):
+        """Create shapes from many dictionary specifications, as |Shape.from_dict| does, but faster.
+
+        The specifications are read in chunks, and within each chunk, the vertices of all circles
+        with the same number of vertices, of all rectangles, and of all polygons with the same number of vertices
+        are computed together.
+        This is a generator, so only one chunk of specifications is held in memory at a time.
+
+        Parameters
+        ----------
+        specs : iterable of dict
+            Specifications, as accepted by |Shape.from_dict|.
+        chunk_size : int, optional
+            Number of specifications to process together.
+
+        Yields
+        ------
+        |Shape|
+            In the order of `specs`.
+
+        """
+        specs = iter(specs)
+        while True:
+            chunk = [spec for _, spec in zip(range(chunk_size), specs)]
+            if not chunk:
+                return
+            shapes = [None] * len(chunk)
+            groups = {}
+            for i, spec in enumerate(chunk):
+                key = _spec_group(spec)
+                if key is None:
+                    shapes[i] = cls.from_dict(spec)
+                else:
+                    groups.setdefault(key, []).append(i)
+            for key, indices in groups.items():
+                for i, shape in zip(indices, cls._from_spec_group(key, [chunk[i] for i in indices])):
+                    shapes[i] = shape
+            yield from shapes
+
+    @classmethod
+    def from_file(cls, file, chunk_size=1024):
+        """Create shapes from a file of dictionary specifications, reading it incrementally.
+
+        Parameters
+        ----------
+        file : str or file
+            Path to, or text file object of, a JSON file containing an array of specifications,
+            or a file with one JSON specification per line.
+            Specifications are as accepted by |Shape.from_dict|.
+        chunk_size : int, optional
+            Passed to |Shape.from_dicts|.
+
+        Yields
+        ------
+        |Shape|
+            In the order of the file.
+
+        Examples
+        --------
+        Shapes can be added to a batch while the file is read, so that they are never all held in a list::
+
+            batch = ShapeBatch(Shape.from_file('level.ndjson'))
+
+        """
+        if isinstance(file, (str, os.PathLike)):
+            with open(file) as opened:
+                yield from cls.from_dicts(_iter_json_objects(opened), chunk_size)
+        else:
+            yield from cls.from_dicts(_iter_json_objects(file), chunk_size)
+
+    @classmethod
+    def save_scene(cls, file, shapes):
+        """Save shapes to a compact binary file, to be loaded with |Shape.load_scene|.
+
+        Vertices, contours, colors, velocities and angular velocities are stored as flat arrays.
+        Vertices are written as each shape is read from `shapes`, which can be a generator.
+        Named colors (from `colors`) are also saved.
+
+        Parameters
+        ----------
+        file : str or file
+            Path to, or seekable binary file object of, the file to write.
+        shapes : iterable of |Shape|
+
+        """
+        if isinstance(file, (str, os.PathLike)):
+            with open(file, 'wb') as opened:
+                return cls.save_scene(opened, shapes)
+
+        start = file.tell()
+        file.write(_SCENE_PREAMBLE.pack(_SCENE_MAGIC, 0, 0))
+        dtype = np.dtype(cls.dtype).newbyteorder('<')
+        points_offset = _align_scene(file, start)
+        lengths, contour_starts, holes, colors, motion, enabled, tolerances, palettes = [], [], [], [], [], [], [], []
+        for i, shape in enumerate(shapes):
+            file.write(np.ascontiguousarray(shape._points, dtype=dtype).tobytes())
+            lengths.append(len(shape._points))
+            offsets, shape_holes = shape._contour_buffers()[1:]
+            contour_starts.append(offsets[:-1])
+            holes.append(shape_holes)
+            colors.append(shape.colors[shape._color])
+            motion.append(shape._motion.tolist())
+            enabled.append(shape.enabled)
+            tolerances.append(np.nan if shape._tolerance is None else shape._tolerance)
+            if not isinstance(shape.colors, MappingProxyType):
+                palettes.append([i, {name: list(color) for name, color in shape.colors.items()}, shape._color])
+
+        header = {
+            'version': _SCENE_VERSION,
+            'arrays': {'points': {'dtype': dtype.str, 'shape': [sum(lengths), 2], 'offset': points_offset}},
+            'palettes': palettes,
+        }
+        arrays = [
+            ('shape_offsets', np.cumsum([0] + lengths)),
+            ('contour_offsets', np.cumsum([0] + [len(shape_holes) for shape_holes in holes])),
+            ('contour_starts', np.concatenate(contour_starts) if contour_starts else np.empty(0, dtype=int)),
+            ('holes', np.concatenate(holes) if holes else np.empty(0, dtype=bool)),
+            ('colors', np.array(colors, dtype=np.uint8).reshape(-1, 3)),
+            ('motion', np.array(motion, dtype=float).reshape(-1, 3)),
+            ('enabled', np.array(enabled, dtype=bool)),
+            ('tolerances', np.array(tolerances, dtype=float)),
+        ]
+        for name, array in arrays:
+            offset = _align_scene(file, start)
+            array = array.astype(array.dtype.newbyteorder('<'), copy=False)
+            file.write(np.ascontiguousarray(array).tobytes())
+            header['arrays'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+
+        header_offset = file.tell() - start
+        encoded = json.dumps(header).encode()
+        file.write(encoded)
+        end = file.tell()
+        file.seek(start)
+        file.write(_SCENE_PREAMBLE.pack(_SCENE_MAGIC, header_offset, len(encoded)))
+        file.seek(end)
+
+    @classmethod
+    def load_scene(cls, file):
+        """Load shapes saved with |Shape.save_scene|.
+
+        The file is memory-mapped, and the vertices of each shape are a view of the mapping rather than a copy,
+        so large scenes open quickly, and vertices are only read from disk when they are used.
+        Modifying the shapes does not modify the file.
+
+        Parameters
+        ----------
+        file : str or file
+            Path to, or binary file object of, the file to read.
+            File objects that cannot be memory-mapped (such as :class:`io.BytesIO`) are read into memory.
+
+        Returns
+        -------
+        list of |Shape|
+            In the order they were saved.
+
+        """
+        header, arrays = _read_scene(file)
+        points = arrays['points'].astype(cls.dtype, copy=False)
+        shape_offsets = arrays['shape_offsets'].tolist()
+        contour_offsets = arrays['contour_offsets'].tolist()
+        contour_starts, holes, motion = arrays['contour_starts'], arrays['holes'], arrays['motion']
+        colors = arrays['colors'].tolist()
+        enabled = arrays['enabled'].tolist()
+        tolerances = arrays['tolerances'].tolist()
+
+        shapes = []
+        for i, (start, stop) in enumerate(zip(shape_offsets[:-1], shape_offsets[1:])):
+            first, last = contour_offsets[i], contour_offsets[i + 1]
+            contours = None
+            if last - first != 1 or holes[first]:
+                contours = (np.append(contour_starts[first:last], stop - start), tuple(holes[first:last].tolist()))
+            shape = cls._from_points(points[start:stop], contours)
+            shape.colors = _palette(tuple(colors[i]))
+            shape._color = 'primary'
+            # Like the vertices, the velocities are a view of the mapping.
+            shape._motion = motion[i]
+            shape.enabled = enabled[i]
+            shape._tolerance = None if math.isnan(tolerances[i]) else tolerances[i]
+            shapes.append(shape)
+
+        for i, palette, color in header['palettes']:
+            shapes[i].colors = {name: tuple(value) for name, value in palette.items()}
+            shapes[i]._color = color
+        return shapes
+
+    @classmethod
+    def _from_spec_group(cls, key, specs):
+        """Create shapes from specifications of the same kind, computing all their vertices at once.
+
+        """
+        kind, n_vertices, start_angle = key
+        if kind == 'circle':
+            centers = np.array([spec['center'] for spec in specs], dtype=float)
+            radii = np.array([spec['radius'] for spec in specs], dtype=float)
+            if start_angle:
+                angles = (np.arange(n_vertices) * 2 * np.pi / n_vertices) + start_angle
+                unit_circle = np.array([np.cos(angles), np.sin(angles)]).T
+            else:
+                unit_circle = _unit_circle(n_vertices)
+            points = centers[:, np.newaxis] + radii[:, np.newaxis, np.newaxis] * unit_circle
+        elif kind == 'rectangle':
+            (x_min, y_min), (x_max, y_max) = np.array([spec['vertices'] for spec in specs], dtype=float).transpose(1, 2, 0)
+            points = np.stack([np.column_stack(corner) for corner in
+                               [(x_min, y_min), (x_max, y_min), (x_max, y_max), (x_min, y_max)]], axis=1)
+        else:
+            points = np.array([spec['vertices'] for spec in specs], dtype=float)
+        points = points.astype(cls.dtype, copy=False)
+
+        # Regular polygons and rectangles are convex.
+        triangulation = None if kind == 'polygon' else (_fan_indices(n_vertices), None)
+        for shape_points, spec in zip(points, specs):
+            shape = cls._from_points(shape_points, triangulation=triangulation)
+            shape._set_attributes(**{name: value for name, value in spec.items() if name not in _GEOMETRY_FIELDS})
+            yield shape
+
+    @classmethod
+    def _from_points(cls, points, contours=None, triangulation=None):
+        """Create a shape whose vertices are `points`, without copying them, and with no other attributes set.
+
+        """
+        shape = cls.__new__(cls)
+        shape._points = points
+        shape._contours = contours
+        shape._poly = None
+        shape._triangulation = triangulation
+        shape._geometry_version = next(_versions)
+        shape._cache_version = None
+        shape._pending_matrix = None
+        shape._allocated_vertex_list = None
+        shape._model = None
+        shape._tolerance = None
+        shape.enabled = True
+        return shape
+
+    @classmethod
+    @_instrumented('boolean')
+    def union_all(cls, shapes, processes=None, **kwargs):
+        """Create the union of many shapes, using several processes.
+
+        The shapes are sorted along the x axis and split into one group per process.
+        Each group is combined by a process of a pool, as a balanced tree of unions (rather than one by one,
+        so that intermediate results stay small), and the results are then combined in the same way.
+        The result is the same as combining the shapes one by one with ``|``.
+
+        Parameters
+        ----------
+        shapes : iterable of |Shape|
+        processes : int, optional
+            Number of processes to use. Defaults to the number of CPUs.
+            If 1, or if there are few shapes, everything is done in the current process.
+        kwargs
+            Other keyword arguments are passed to the |Shape| constructor.
+
+        """
+        return cls(_union_polygon(shapes, processes), **kwargs)
+
+    @classmethod
+    @_instrumented('boolean')
+    def difference_all(cls, base, shapes, processes=None, **kwargs):
+        """Subtract many shapes from a shape, using several processes.
+
+        The union of `shapes` is computed with |Shape.union_all|, and subtracted from `base`.
+        The result is the same as subtracting the shapes one by one with ``-``.
+
+        Parameters
+        ----------
+        base : |Shape|
+        shapes : iterable of |Shape|
+        processes : int, optional
+            Number of processes to use, as in |Shape.union_all|.
+        kwargs
+            Other keyword arguments are passed to the |Shape| constructor.
+
+        """
+        return cls(base._get_poly() - _union_polygon(shapes, processes), **kwargs)
+
+    def _contour_buffers(self):
+        """The contours as arrays, which are compact to send to other processes: points, contour offsets, and holes.
+
+        """
+        if self._contours is None:
+            return np.asarray(self._points, dtype=float), np.array([0, len(self)]), np.zeros(1, dtype=bool)
+        offsets, holes = self._contours
+        return np.asarray(self._points, dtype=float), np.asarray(offsets), np.array(holes, dtype=bool)
+
     @property
     def vertices(self):
-        return np.asarray(point_list(self.poly))
+        vertices = self._points.view()
+        vertices.flags.writeable = False
+        return vertices
+
+    @property
+    def poly(self):
+        return Polygon(self._get_poly())
+
+    def _get_poly(self):
+        """The cached |Polygon| of the geometry, built when first needed. It must not be modified.
+
+        """
+        if self._poly is None or self._poly_version != self._geometry_version:
+            poly = Polygon()
+            for points, hole in self._iter_contours():
+                poly.addContour(points, hole)
+            self._poly = poly
+            self._poly_version = self._geometry_version
+        return self._poly
+
+    def _set_polygon(self, poly):
+        """Replace the geometry with the contours of a |Polygon|.
+
+        """
+        contours = [np.asarray(poly[i], dtype=self.dtype).reshape(-1, 2) for i in range(len(poly))]
+        self._points = np.concatenate(contours) if contours else np.empty((0, 2), dtype=self.dtype)
+        if len(contours) == 1 and not poly.isHole(0):
+            self._contours = None
+        else:
+            offsets = np.cumsum([0] + [len(contour) for contour in contours])
+            self._contours = (offsets, tuple(bool(poly.isHole(i)) for i in range(len(poly))))
+        self._poly = poly
+        self._triangulation = None
+
+    def _iter_contours(self):
+        """Yield the points of each contour, and whether it is a hole.
+
+        """
+        if self._contours is None:
+            yield self._points, False
+        else:
+            offsets, holes = self._contours
+            for start, stop, hole in zip(offsets[:-1], offsets[1:], holes):
+                yield self._points[start:stop], hole
+
+    @property
+    def velocity(self):
+        return self._motion[:2]
+
+    @velocity.setter
+    def velocity(self, value):
+        self._motion[:2] = value
+
+    @property
+    def angular_velocity(self):
+        return float(self._motion[2])
+
+    @angular_velocity.setter
+    def angular_velocity(self, value):
+        self._motion[2] = value
 
     @property
     def color(self):
@@ -179,6 +746,8 @@ class Shape:
     def color(self, value):
         if value in self.colors:
             self._color = value
+        elif isinstance(self.colors, MappingProxyType):
+            self.colors = _palette(tuple(value))
         else:
             self.colors[self._color] = value
 
@@ -187,11 +756,97 @@ class Shape:
         """Keyword arguments for recreating the Shape from the vertices.
 
         """
-        return dict(color=self.color, velocity=self.velocity, colors=self.colors)
+        kwargs = dict(color=self.color, velocity=self.velocity)
+        if not isinstance(self.colors, MappingProxyType):
+            kwargs['colors'] = self.colors
+        return kwargs
 
     @property
     def center(self):
-        return np.asarray(self.poly.center())
+        self._validate_cache()
+        if self._cached_center is None:
+            self._cached_center = self._compute_center()
+        return self._cached_center.copy()
+
+    def _compute_center(self):
+        # Area-weighted centroid of the contours, with holes counting negatively, as in |Polygon|.
+        points = np.asarray(self._points, dtype=float)
+        following = points[self._next_indices()]
+        if self._contours is None:
+            starts = np.zeros(1, dtype=int)
+            signs = np.ones(1)
+        else:
+            offsets, holes = self._contours
+            starts = offsets[:-1]
+            signs = np.where(holes, -1.0, 1.0)
+
+        cross = points[:, 0] * following[:, 1] - following[:, 0] * points[:, 1]
+        areas = np.add.reduceat(cross, starts) / 2
+        moments = np.add.reduceat((points + following) * cross[:, np.newaxis], starts) / 6
+        total_area = np.sum(signs * np.abs(areas))
+        if total_area == 0:
+            return points.mean(axis=0) if len(points) else np.full(2, np.nan)
+        return np.sum((signs * np.sign(areas))[:, np.newaxis] * moments, axis=0) / total_area
+
+    def _next_indices(self):
+        """Index of the vertex following each vertex, along its contour.
+
+        """
+        next_indices = np.arange(1, len(self._points) + 1)
+        if self._contours is None:
+            next_indices[-1:] = 0
+        else:
+            offsets = self._contours[0]
+            next_indices[offsets[1:] - 1] = offsets[:-1]
+        return next_indices
+
+    @property
+    def bounds(self):
+        if not len(self._points):
+            return _EMPTY_BOUNDS
+        self._validate_cache()
+        if self._cached_bounds is None:
+            self._cached_bounds = np.array([self._points.min(axis=0), self._points.max(axis=0)], dtype=float)
+            self._cached_bounds.flags.writeable = False
+        return self._cached_bounds
+
+    @property
+    def bounding_circle(self):
+        self._validate_cache()
+        center = self.center
+        if not len(self._points):
+            return center, 0.0
+        if self._cached_bounding_radius is None:
+            self._cached_bounding_radius = float(np.sqrt(np.max(np.sum((self._points - center) ** 2, axis=1))))
+        return center, self._cached_bounding_radius
+
+    @property
+    def _bounding_box_center(self):
+        if not len(self._points):
+            # Any point will do as the center of transformations of an empty shape, as long as it is finite.
+            return np.zeros(2)
+        bounds = self.bounds
+        return (bounds[0] + bounds[1]) / 2
+
+    def _validate_cache(self):
+        """Bring cached properties of the geometry up to date if it was modified since they were computed.
+
+        If it was only transformed, they are transformed too (or dropped, if they cannot be), otherwise discarded.
+
+        """
+        if self._cache_version != self._geometry_version:
+            # The first vertex is followed to find the translation part of the transformations.
+            anchor = self._points[0].tolist() if len(self._points) else None
+            matrix = self._pending_matrix
+            if matrix is None or anchor is None:
+                self._cached_center = self._cached_bounds = self._cached_bounding_radius = None
+            else:
+                (a, b), (c, d) = matrix.tolist()
+                (x, y), (previous_x, previous_y) = anchor, self._cache_anchor
+                self._update_cache(matrix, (x - a * previous_x - b * previous_y, y - c * previous_x - d * previous_y))
+            self._pending_matrix = None
+            self._cache_version = self._geometry_version
+            self._cache_anchor = anchor
 
     @center.setter
     def center(self, value):
@@ -206,12 +861,23 @@ class Shape:
         self.scale(value / self.radius)
 
     @property
+    @_instrumented('vertex_building')
     def _gl_vertices(self):
-        return list(chain(self.center, *point_list(self.poly)))
+        gl_vertices = np.empty((self._vertex_count, 2), dtype=np.float32)
+        gl_vertices[0] = self.center
+        gl_vertices[1:len(self) + 1] = self._points
+        interpolations = self._get_triangulation()[1]
+        if interpolations is not None:
+            first, second, proportions = interpolations
+            start = self._points[first]
+            gl_vertices[len(self) + 1:] = start + proportions[:, np.newaxis] * (self._points[second] - start)
+        if self.stats is not None:
+            self.stats.count('uploaded_vertices', len(gl_vertices))
+        return gl_vertices.ravel().tolist()
 
     @property
     def _gl_colors(self):
-        return (len(self) + 1) * self.colors[self._color]
+        return self._vertex_count * self.colors[self._color]
 
     def distance_to(self, point):
         """Distance from center to arbitrary point.
@@ -227,6 +893,58 @@ class Shape:
         """
         return np.linalg.norm(self.center - point)
 
+    def distance_to_points(self, points):
+        """Distance from center to each of an array of points.
+
+        Parameters
+        ----------
+        points : array-like
+            An array of points, with x and y columns.
+
+        Returns
+        -------
+        |array|
+
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        center = self.center
+        return np.hypot(points[:, 0] - center[0], points[:, 1] - center[1])
+
+    def contains_points(self, points):
+        """Test whether each of an array of points is inside the shape (and not in a hole).
+
+        Parameters
+        ----------
+        points : array-like
+            An array of points, with x and y columns.
+
+        Returns
+        -------
+        |array|
+            A boolean array, with one element per point.
+
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        result = np.zeros(len(points), dtype=bool)
+        if not len(self._points):
+            return result
+        (x_min, y_min), (x_max, y_max) = self.bounds
+        x, y = points.T
+        candidates = np.flatnonzero((x >= x_min) & (x <= x_max) & (y >= y_min) & (y <= y_max))
+
+        # Count the edges crossed by a ray from each point towards positive x; the point is inside if it is odd.
+        starts = np.asarray(self._points, dtype=float)
+        ends = starts[self._next_indices()]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slopes = (ends[:, 0] - starts[:, 0]) / (ends[:, 1] - starts[:, 1])
+        for chunk in _chunks(candidates, len(starts)):
+            chunk_x, chunk_y = x[chunk, np.newaxis], y[chunk, np.newaxis]
+            straddles = (starts[:, 1] > chunk_y) != (ends[:, 1] > chunk_y)
+            with np.errstate(invalid='ignore'):
+                crossings = straddles & (chunk_x < starts[:, 0] + (chunk_y - starts[:, 1]) * slopes)
+            result[chunk] = np.count_nonzero(crossings, axis=1) % 2 == 1
+        return result
+
     def scale(self, factor, center=None):
         """Resize the shape by a proportion (e.g., 1 is unchanged), in-place.
 
@@ -236,20 +954,10 @@ class Shape:
             If a scalar, the same factor will be applied in the x and y dimensions.
         center : array-like, optional
             Point around which to perform the scaling.
-            If not passed, the center of the shape is used.
+            If not passed, the center of the shape's bounding box is used.
 
         """
-        factor = np.asarray(factor)
-
-        if len(factor.shape):
-            args = list(factor)
-        else:
-            args = [factor, factor]
-        if center is not None:
-            args.extend(center)
-
-        self.poly.scale(*args)
-        return self
+        return self.transform(factor=factor, center=center)
 
     def translate(self, vector):
         """Translate the shape along a vector, in-place.
@@ -259,7 +967,14 @@ class Shape:
         vector : array-like
 
         """
-        self.poly.shift(*vector)
+        stats = self.stats
+        if stats is not None:
+            start = stats.clock()
+        self._points += vector
+        self._geometry_changed(offset=vector)
+        if stats is not None:
+            stats.record('transform', start)
+        return self
 
     def rotate(self, angle, center=None):
         """Rotate the shape, in-place.
@@ -270,14 +985,10 @@ class Shape:
             Angle to rotate, in radians counter-clockwise.
         center : array-like, optional
             Point about which to rotate.
-            If not passed, the center of the shape will be used.
+            If not passed, the center of the shape's bounding box will be used.
 
         """
-        args = [angle]
-        if center is not None:
-            args.extend(center)
-        self.poly.rotate(*args)
-        return self
+        return self.transform(angle=angle, center=center)
 
     def flip_x(self, center=None):
         """Flip the shape in the x direction, in-place.
@@ -286,13 +997,21 @@ class Shape:
         ----------
         center : array-like, optional
             Point about which to flip.
-            If not passed, the center of the shape will be used.
+            If not passed, the center of the shape's bounding box will be used.
 
          """
+        stats = self.stats
+        if stats is not None:
+            start = stats.clock()
         if center is None:
-            self.poly.flip()
-        else:
-            self.poly.flip(center[0])
+            center = self._bounding_box_center
+        x = self._points[:, 0]
+        x *= -1
+        x += 2 * center[0]
+        self._geometry_changed(np.diag([-1, 1]), [2 * center[0], 0])
+        if stats is not None:
+            stats.record('transform', start)
+        return self
 
     def flip_y(self, center=None):
         """Flip the shape in the y direction, in-place.
@@ -301,13 +1020,20 @@ class Shape:
         ----------
         center : array-like, optional
             Point about which to flip.
-            If not passed, the center of the shape will be used.
+            If not passed, the center of the shape's bounding box will be used.
 
          """
+        stats = self.stats
+        if stats is not None:
+            start = stats.clock()
         if center is None:
-            self.poly.flop()
-        else:
-            self.poly.flop(center[1])
+            center = self._bounding_box_center
+        y = self._points[:, 1]
+        y *= -1
+        y += 2 * center[1]
+        self._geometry_changed(np.diag([1, -1]), [0, 2 * center[1]])
+        if stats is not None:
+            stats.record('transform', start)
         return self
 
     def flip(self, angle, center=None):
@@ -320,27 +1046,381 @@ class Shape:
             defining the angle about which to flip the shape (of a line through `center`).
         center : array-like, optional
             The point about which to flip.
-            If not passed, the center of the shape will be used.
+            If not passed, the center of the shape's bounding box will be used.
+
+        """
+        cos, sin = math.cos(2 * angle), math.sin(2 * angle)
+        return self.transform([[cos, sin], [sin, -cos]], center=center)
+
+    def transform(self, matrix=None, offset=None, center=None, angle=0, factor=1):
+        """Apply an affine transformation in-place, in a single pass over the vertices.
+
+        Each point ``x`` is moved to ``matrix.dot(x - center) + center + offset``.
+        This is equivalent to, but cheaper than, a sequence of calls to |Shape.scale|, |Shape.rotate|,
+        the flip methods, and |Shape.translate|.
+
+        Parameters
+        ----------
+        matrix : array-like, optional
+            A 2x2 matrix.
+            If not passed, it is composed from `angle` and `factor`: scaling (and flipping) first, then rotation.
+        offset : array-like, optional
+            Translation applied after the transformation.
+        center : array-like, optional
+            Point about which to transform.
+            If not passed, the center of the shape's bounding box will be used.
+        angle : float, optional
+            Angle to rotate, in radians counter-clockwise. Ignored if `matrix` is passed.
+        factor : float or array-like, optional
+            Scale factor, as in |Shape.scale|. Negative factors flip the shape. Ignored if `matrix` is passed.
+
+        """
+        stats = self.stats
+        if stats is not None:
+            start = stats.clock()
+        # The matrix and offset are small, so they are composed with Python floats, which is much cheaper than NumPy.
+        if matrix is None:
+            x_factor, y_factor = (factor, factor) if np.isscalar(factor) or np.ndim(factor) == 0 else factor
+            cos, sin = math.cos(angle), math.sin(angle)
+            a, b, c, d = cos * x_factor, -sin * y_factor, sin * x_factor, cos * y_factor
+            matrix = np.array(((a, b), (c, d)))
+        else:
+            # Copied, as it may be kept to update cached properties later.
+            matrix = np.array(matrix, dtype=float)
+            (a, b), (c, d) = matrix.tolist()
+        if center is None:
+            center = self._bounding_box_center
+        x, y = np.asarray(center, dtype=float).tolist()
+        x_offset, y_offset = x - a * x - b * y, y - c * x - d * y
+        if offset is not None:
+            x_offset, y_offset = np.add((x_offset, y_offset), offset).tolist()
+        offset = x_offset, y_offset
+
+        points = self._points
+        if b == c == 0:
+            # Scaling and flipping need no matrix product.
+            if a != 1 or d != 1:
+                points *= a if a == d else (a, d)
+        else:
+            points[...] = points.dot(matrix.T)
+        points += offset
+        self._geometry_changed(matrix, offset)
+        if self._tolerance is not None:
+            self._update_level_of_detail(matrix)
+        if stats is not None:
+            stats.record('transform', start)
+        return self
+
+    def _update_level_of_detail(self, matrix):
+        """Tessellate a circle with adaptive level of detail again, if a transformation changed its ideal vertex count.
+
+        """
+        scale = _similarity_scale(matrix)
+        if scale is None:
+            self._tolerance = None
+            return
+        if scale == 1:
+            return
+        center = self.center
+        first = self._points[0] - center
+        radius = math.hypot(*first)
+        n_vertices = _circle_vertex_count(radius, self._tolerance, self.min_circle_vertices, self.max_circle_vertices)
+        if n_vertices == len(self):
+            return
+
+        cos, sin = first / radius
+        points = center + radius * _unit_circle(n_vertices).dot(np.array([[cos, sin], [-sin, cos]]))
+        self._points = points.astype(self.dtype)
+        self._triangulation = None
+        model = self._model
+        self._geometry_changed()
+        self._resize_vertex_list(model)
+
+    def copy(self):
+        """Create a copy of the shape.
+
+        The vertices are copied directly, and the triangulation and cached properties are shared or copied,
+        so that nothing is recomputed.
+        The copy has its own vertex list, created when it is first drawn.
+
+        Returns
+        -------
+        |Shape|
+
+        """
+        copy = type(self).__new__(type(self))
+        copy._points = self._points.copy()
+        copy._contours = self._contours
+        copy._poly = None
+        copy._triangulation = self._triangulation
+        copy.colors = self.colors
+        copy._color = self._color
+        copy._motion = self._motion.copy()
+        copy.enabled = self.enabled
+        copy._geometry_version = self._geometry_version
+        copy._cache_version = self._cache_version
+        if self._cache_version is not None:
+            copy._cache_anchor = self._cache_anchor
+            copy._cached_center = self._cached_center
+            copy._cached_bounds = self._cached_bounds
+            copy._cached_bounding_radius = self._cached_bounding_radius
+        copy._pending_matrix = self._pending_matrix
+        copy._allocated_vertex_list = None
+        copy._model = None
+        copy._tolerance = self._tolerance
+        return copy
+
+    __copy__ = copy
+
+    def _geometry_changed(self, matrix=None, offset=None):
+        """Mark the geometry as modified, so that the next draw uploads the vertices again.
+
+        If the modification was an affine transformation ``x -> matrix.dot(x) + offset``,
+        passing it allows cached properties to be updated rather than recomputed,
+        and a standalone vertex list to be drawn with a model matrix rather than uploaded again.
+        Cached properties are only updated when next read: until then, only the matrices are composed,
+        and the offset is found from where the first vertex moved.
+
+        """
+        if self._model is not None:
+            self._update_model(matrix, offset)
+
+        if matrix is None and offset is None:
+            self._pending_matrix = None
+        elif self._cache_version == self._geometry_version:
+            self._pending_matrix = _LINEAR_IDENTITY if matrix is None else matrix
+        elif self._pending_matrix is not None and matrix is not None:
+            self._pending_matrix = matrix.dot(self._pending_matrix)
+        self._geometry_version = next(_versions)
+
+    def _update_cache(self, matrix, offset):
+        """Apply an affine transformation to the cached properties, dropping those that cannot be transformed.
+
+        The cached properties are small, so they are transformed with Python floats, which is cheaper than NumPy.
+
+        """
+        (a, b), (c, d) = matrix.tolist()
+        x_offset, y_offset = offset
+        # The centroid is preserved by any affine transformation.
+        if self._cached_center is not None:
+            x, y = self._cached_center.tolist()
+            self._cached_center = np.array((a * x + b * y + x_offset, c * x + d * y + y_offset))
+        # An axis-aligned box stays axis-aligned under translation, scaling and flipping.
+        if self._cached_bounds is not None:
+            if b == c == 0:
+                (x_min, y_min), (x_max, y_max) = self._cached_bounds.tolist()
+                x_min, x_max = sorted((a * x_min + x_offset, a * x_max + x_offset))
+                y_min, y_max = sorted((d * y_min + y_offset, d * y_max + y_offset))
+                self._cached_bounds = np.array(((x_min, y_min), (x_max, y_max)))
+                self._cached_bounds.flags.writeable = False
+            else:
+                self._cached_bounds = None
+        # A circle stays a circle under rotation, flipping and uniform scaling.
+        if self._cached_bounding_radius is not None and matrix is not _LINEAR_IDENTITY:
+            scale = _similarity_scale(matrix)
+            if scale is None:
+                self._cached_bounding_radius = None
+            else:
+                self._cached_bounding_radius *= scale
+
+    def _update_model(self, matrix, offset):
+        """Compose the model matrix with an affine transformation, or drop it if the modification was not affine.
+
+        """
+        if matrix is None and offset is None:
+            self._model = None
+            return
+        step = np.eye(3)
+        if matrix is not None:
+            step[:2, :2] = matrix
+        if offset is not None:
+            step[:2, 2] = offset
+        self._model = step.dot(self._model)
+
+    @property
+    def _triangle_indices(self):
+        return self._get_triangulation()[0]
+
+    @property
+    def _vertex_count(self):
+        """Number of vertices in the vertex list: the center, the shape's vertices, and any new triangulation points.
 
         """
-        return self.rotate(-angle, center=center).flip_y(center=center).rotate(angle, center=center)
+        interpolations = self._get_triangulation()[1]
+        return len(self) + 1 + (0 if interpolations is None else len(interpolations[0]))
+
+    def _get_triangulation(self):
+        # Affine transformations map a triangulation to a triangulation (and convex shapes to convex shapes),
+        # so this only needs to be recomputed when the vertices are replaced.
+        if self._triangulation is None:
+            if self._contours is None and _is_convex(self._points):
+                self._triangulation = _fan_indices(len(self)), None
+            else:
+                self._triangulation = self._triangulate()
+        return self._triangulation
 
-    def _get_vertex_list(self):
+    def _triangulate(self):
+        """Triangulate a concave or multi-contour shape, from the triangle strips computed by |Polygon|.
+
+        The strips contain new points, where |Polygon| splits the shape along horizontal lines.
+        These always lie on an edge of the shape, so they are stored as interpolations between two vertices,
+        which remain valid under affine transformations.
+
+        Returns
+        -------
+        indices : tuple of int
+            Indices into the vertex list, i.e., offset by one for the center vertex.
+        interpolations : tuple of array
+            For each new point, the indices of the two vertices it lies between,
+            and the proportion of the distance from the first to the second.
+
+        """
+        points = np.asarray(self._points, dtype=float)
+        lookup = {point: i + 1 for i, point in enumerate(map(tuple, points.tolist()))}
+        new_points = []
         indices = []
-        for i in range(1, len(self) + 1):
-            indices.extend([0, i, i + 1])
-        indices[-1] = 1
-        return pyglet.graphics.vertex_list_indexed(
-            len(self) + 1, indices, ('v2f', self._gl_vertices), ('c3B', self._gl_colors))
+        for strip in self._get_poly().triStrip():
+            strip_indices = []
+            for point in map(tuple, np.asarray(strip).tolist()):
+                if point not in lookup:
+                    lookup[point] = len(points) + 1 + len(new_points)
+                    new_points.append(point)
+                strip_indices.append(lookup[point])
+            for i in range(len(strip_indices) - 2):
+                indices.extend(strip_indices[i:i + 3])
+
+        if not new_points:
+            return tuple(indices), None
+
+        starts = points
+        following = self._next_indices()
+        directions = points[following] - starts
+        new_points = np.array(new_points).reshape(-1, 2)
+        interpolations = []
+        # Find the closest edge to each new point.
+        for chunk in _chunks(new_points, len(points)):
+            offsets = chunk[:, np.newaxis] - starts
+            lengths = np.maximum(np.sum(directions ** 2, axis=1), np.finfo(float).tiny)
+            proportions = np.clip(np.sum(offsets * directions, axis=2) / lengths, 0, 1)
+            distances = np.sum((offsets - proportions[:, :, np.newaxis] * directions) ** 2, axis=2)
+            edges = np.argmin(distances, axis=1)
+            interpolations.append((edges, proportions[np.arange(len(chunk)), edges]))
+        edges = np.concatenate([edges for edges, _ in interpolations])
+        proportions = np.concatenate([proportions for _, proportions in interpolations])
+        return tuple(indices), (edges, following[edges], proportions)
 
-    def draw(self):
+    @property
+    def _vertex_list(self):
+        if self._allocated_vertex_list is None:
+            self._set_vertex_list()
+        return self._allocated_vertex_list
+
+    @_instrumented('upload')
+    def _get_vertex_list(self, batch=None):
+        pyglet = _pyglet()
+        data = ('v2f', self._gl_vertices), ('c3B', self._gl_colors)
+        if batch is None:
+            return pyglet.graphics.vertex_list_indexed(self._vertex_count, self._triangle_indices, *data)
+        return batch.add_indexed(self._vertex_count, pyglet.gl.GL_TRIANGLES, None, self._triangle_indices, *data)
+
+    def _set_vertex_list(self, batch=None):
+        """Replace the vertex list with a new one, standalone or allocated from a |Batch|.
+
+        """
+        self._release_vertex_list()
+        self._allocated_vertex_list = self._get_vertex_list(batch)
+        self._uploaded_geometry_version = self._geometry_version
+        self._uploaded_color = self.colors[self._color]
+        # Shapes in a batch are drawn together, so they cannot have their own model matrix.
+        self._model = _IDENTITY if batch is None else None
+
+    def _resize_vertex_list(self, model):
+        """Resize the vertex list, if any, after the number of vertices changed, and upload everything.
+
+        `model` is the model matrix before the change, which is None if the vertex list belongs to a batch.
+
+        """
+        vertex_list = self._allocated_vertex_list
+        if vertex_list is None:
+            return
+        indices = self._triangle_indices
+        vertex_list.resize(self._vertex_count, len(indices))
+        # Disabled shapes in a ShapeBatch are hidden with degenerate triangles.
+        _set_indices(vertex_list, indices if self.enabled else (0,) * len(indices))
+        self._upload_vertices(vertex_list)
+        vertex_list.colors = self._gl_colors
+        self._uploaded_geometry_version = self._geometry_version
+        self._uploaded_color = self.colors[self._color]
+        self._model = None if model is None else _IDENTITY
+
+    @_instrumented('upload')
+    def _upload_vertices(self, vertex_list):
+        vertex_list.vertices = self._gl_vertices
+
+    def _release_vertex_list(self):
+        """Delete the vertex list. A new one is created when the shape is next drawn.
+
+        """
+        if self._allocated_vertex_list is not None:
+            self._allocated_vertex_list.delete()
+            self._allocated_vertex_list = None
+
+    def draw(self, viewport=None):
         """Draw the shape in the current OpenGL context.
 
+        If the shape was only translated, rotated, scaled or flipped since it was last drawn,
+        its vertices are not uploaded again: the previous ones are drawn with a model matrix instead.
+
+        Parameters
+        ----------
+        viewport : array-like, optional
+            The visible rectangle, as ``[[x_min, y_min], [x_max, y_max]]`` (e.g., the window).
+            If passed, and the shape's bounding box lies outside it,
+            the shape is skipped: nothing is uploaded or drawn.
+
+        """
+        if self.enabled and (viewport is None or _boxes_intersect(self.bounds, viewport)):
+            stats = self.stats
+            if stats is not None:
+                start = stats.clock()
+            self._sync_vertex_list(model=True)
+            gl = _pyglet().gl
+            if self._uploaded_geometry_version == self._geometry_version:
+                self._vertex_list.draw(gl.GL_TRIANGLES)
+            else:
+                gl.glPushMatrix()
+                gl.glMultMatrixf(self._gl_model_matrix)
+                self._vertex_list.draw(gl.GL_TRIANGLES)
+                gl.glPopMatrix()
+            if stats is not None:
+                stats.record('draw', start)
+
+    @property
+    def _gl_model_matrix(self):
+        """The model matrix as a column-major 4x4 OpenGL matrix.
+
+        """
+        return _gl_matrix(self._model)
+
+    def _sync_vertex_list(self, model=False):
+        """Upload vertices and colors to the vertex list, but only those that changed since the last upload.
+
+        If `model` is true, vertices that were only transformed by affine transformations are not uploaded,
+        and are to be drawn with the model matrix.
+
         """
-        if self.enabled:
+        if self._allocated_vertex_list is None:
+            self._set_vertex_list()
+            return
+        if self._uploaded_geometry_version != self._geometry_version and not (model and self._model is not None):
+            self._upload_vertices(self._vertex_list)
+            self._uploaded_geometry_version = self._geometry_version
+            self._model = _IDENTITY if model else None
+
+        color = self.colors[self._color]
+        if color != self._uploaded_color:
             self._vertex_list.colors = self._gl_colors
-            self._vertex_list.vertices = self._gl_vertices
-            self._vertex_list.draw(pyglet.gl.GL_TRIANGLES)
+            self._uploaded_color = color
 
     def update(self, dt):
         """Update the shape's position by moving it forward according to its velocity.
@@ -351,7 +1431,8 @@ class Shape:
 
         """
         self.translate(dt * self.velocity)
-        self.rotate(dt * self.angular_velocity)
+        if self._motion[2]:
+            self.rotate(dt * self._motion[2])
 
     def enable(self, enabled):
         """Set whether the shape should be drawn.
@@ -377,7 +1458,13 @@ class Shape:
         bool
 
         """
-        return bool(self.poly.overlaps(other.poly))
+        stats = self.stats
+        if stats is None:
+            return bool(self._get_poly().overlaps(other._get_poly()))
+        start = stats.clock()
+        result = bool(self._get_poly().overlaps(other._get_poly()))
+        stats.record('collision', start)
+        return result
 
     def covers(self, other):
         """Check if the shape completely covers another shape.
@@ -391,10 +1478,164 @@ class Shape:
         bool
 
         """
-        return bool(self.poly.covers(other.poly))
+        stats = self.stats
+        if stats is None:
+            return bool(self._get_poly().covers(other._get_poly()))
+        start = stats.clock()
+        result = bool(self._get_poly().covers(other._get_poly()))
+        stats.record('collision', start)
+        return result
+
+    @_instrumented('collision')
+    def collide(self, other):
+        """Find the contact between two overlapping shapes, for collision response.
+
+        Convex shapes are tested with the separating axis theorem, directly on the vertices.
+        Otherwise, the contact is estimated from the intersection of the shapes' |Polygon| objects:
+        the normal points from the center of this shape to the center of the intersection,
+        and the contact point is the center of the intersection.
 
-    def __repr__(self):
-        kwarg_strs = []
+        Parameters
+        ----------
+        other : |Shape|
+
+        Returns
+        -------
+        tuple or None
+            None if the shapes do not overlap.
+            Otherwise ``(depth, normal, points)``:
+            moving `other` by ``depth * normal`` (or this shape by ``-depth * normal``) separates the shapes,
+            and `points` is an array of one or two contact points.
+
+        """
+        if not len(self) or not len(other) or not _boxes_intersect(self.bounds, other.bounds):
+            return None
+        if self._convex and other._convex:
+            return _convex_contact(np.asarray(self._points, dtype=float), np.asarray(other._points, dtype=float))
+
+        intersection = self._get_poly() & other._get_poly()
+        if not intersection.area():
+            return None
+        contact = np.array(intersection.center())
+        normal = contact - self.center
+        length = np.hypot(*normal)
+        normal = normal / length if length else np.array([1.0, 0.0])
+        projections = np.concatenate([np.asarray(intersection[i]).dot(normal) for i in range(len(intersection))])
+        return float(projections.max() - projections.min()), normal, contact[np.newaxis]
+
+    @property
+    def _convex(self):
+        # Convex shapes are triangulated as a fan, so this is cached with the triangulation.
+        return self._triangle_indices is _fan_indices(len(self))
+
+    @_instrumented('time_of_impact')
+    def time_of_impact(self, other, dt, tolerance=0.01, max_iterations=100):
+        """Find when the shape first touches another, as both move according to their velocities.
+
+        Unlike checking |Shape.overlaps| after each update,
+        this finds collisions with shapes that would be passed through in a single step.
+        Motion is modeled as in |Shape.update|, including rotation.
+
+        Parameters
+        ----------
+        other : |Shape|
+        dt : float
+            Length of the time interval to search.
+        tolerance : float, optional
+            The shapes are considered touching when they are closer than this.
+        max_iterations : int, optional
+            Maximum number of steps of the search.
+            If it is reached, the time found so far is returned; the shapes are still apart at that time.
+
+        Returns
+        -------
+        float or None
+            The time of impact, between 0 (if the shapes already overlap) and `dt`,
+            or None if the shapes do not touch within `dt`.
+
+        """
+        if not len(self._points) or not len(other._points):
+            return None
+        if not _boxes_intersect(self._swept_bounds(dt), other._swept_bounds(dt)):
+            return None
+        if self.overlaps(other):
+            return 0.0
+        spin = abs(self._motion[2]) * self._rotation_radius() + abs(other._motion[2]) * other._rotation_radius()
+        speed = np.linalg.norm(self._motion[:2] - other._motion[:2]) + spin
+        next_indices, other_next_indices = self._next_indices(), other._next_indices()
+
+        def distance(t):
+            points, other_points = self._moved_points(t), other._moved_points(t)
+            return min(_vertex_edge_distance(points, other_points, other_points[other_next_indices]),
+                       _vertex_edge_distance(other_points, points, points[next_indices]))
+        return _conservative_advancement(distance, speed, dt, tolerance, max_iterations)
+
+    @_instrumented('time_of_impact')
+    def time_to_boundary(self, bounds, dt, tolerance=0.01, max_iterations=100):
+        """Find when the shape first touches the edge of a rectangle around it, as it moves according to its velocity.
+
+        Motion is modeled as in |Shape.update|, including rotation.
+
+        Parameters
+        ----------
+        bounds : array-like
+            The rectangle, as ``[[x_min, y_min], [x_max, y_max]]`` (e.g., the edges of the window).
+        dt : float
+            Length of the time interval to search.
+        tolerance : float, optional
+            The shape is considered touching an edge when it is closer than this.
+        max_iterations : int, optional
+            Maximum number of steps of the search.
+            If it is reached, the time found so far is returned; the shape is still inside at that time.
+
+        Returns
+        -------
+        float or None
+            The time of impact, between 0 (if the shape already touches or crosses an edge) and `dt`,
+            or None if the shape stays inside within `dt`.
+
+        """
+        if not len(self._points):
+            return None
+        (x_min, y_min), (x_max, y_max) = bounds
+        speed = np.linalg.norm(self._motion[:2]) + abs(self._motion[2]) * self._rotation_radius()
+
+        def distance(t):
+            x, y = self._moved_points(t).T
+            return min(np.min(x) - x_min, x_max - np.max(x), np.min(y) - y_min, y_max - np.max(y))
+        return _conservative_advancement(distance, speed, dt, tolerance, max_iterations)
+
+    def _moved_points(self, t):
+        """The vertices as they would be after ``update(t)``, without moving the shape.
+
+        """
+        center = self._bounding_box_center + t * self._motion[:2]
+        cos, sin = np.cos(t * self._motion[2]), np.sin(t * self._motion[2])
+        return (self._points + t * self._motion[:2] - center).dot([[cos, sin], [-sin, cos]]) + center
+
+    def _rotation_radius(self):
+        """Largest distance from the center of the bounding box, about which the shape rotates, to a vertex.
+
+        """
+        if not len(self._points):
+            return 0.0
+        return float(np.sqrt(np.max(np.sum((self._points - self._bounding_box_center) ** 2, axis=1))))
+
+    def _swept_bounds(self, dt):
+        """A bounding box of the shape over the next `dt`, as it moves according to its velocity.
+
+        """
+        if self._motion[2]:
+            radius = self._rotation_radius()
+            center = self._bounding_box_center
+            bounds = np.array([center - radius, center + radius])
+        else:
+            bounds = self.bounds
+        displacement = dt * self._motion[:2]
+        return np.array([np.minimum(bounds[0], bounds[0] + displacement), np.maximum(bounds[1], bounds[1] + displacement)])
+
+    def __repr__(self):
+        kwarg_strs = []
         for arg, value in self._kwargs.items():
             if isinstance(value, str):
                 value_str = "'{}'".format(value)
@@ -429,39 +1670,58 @@ class Shape:
         return self.vertices[item]
 
     def __len__(self):
-        return self.poly.nPoints()
+        return len(self._points)
 
     def __add__(self, other):
         if isinstance(other, Shape):
-            return type(self)(self.poly + other.poly)
-        return type(self)(self.vertices + other, **self._kwargs)
+            return self._combine(other, operator.add)
+        return self.copy().translate(other)
 
     __radd__ = __add__
 
     def __sub__(self, other):
         if isinstance(other, Shape):
-            return type(self)(self.poly - other.poly)
-        return type(self)(self.vertices - other, **self._kwargs)
+            return self._combine(other, operator.sub)
+        return self.copy().translate(np.negative(other))
 
     def __mul__(self, other):
-        return type(self)(self.vertices * other, **self._kwargs)
+        return self.copy().transform(factor=other, center=(0, 0))
 
-    def __rmul__(self, other):
-        return type(self)(other * self.vertices, **self._kwargs)
+    __rmul__ = __mul__
 
     def __truediv__(self, other):
-        return type(self)(self.vertices / other, **self._kwargs)
+        return self.copy().transform(factor=np.reciprocal(np.asarray(other, dtype=float)), center=(0, 0))
 
     __div__ = __truediv__
 
     def __xor__(self, other):
-        return type(self)(self.poly ^ other.poly, **self._kwargs)
+        return self._combine(other, operator.xor, **self._kwargs)
 
     def __and__(self, other):
-        return type(self)(self.poly & other.poly, **self._kwargs)
+        return self._combine(other, operator.and_, **self._kwargs)
 
     def __or__(self, other):
-        return type(self)(self.poly | other.poly, **self._kwargs)
+        return self._combine(other, operator.or_, **self._kwargs)
+
+    @_instrumented('boolean')
+    def _combine(self, other, operation, **kwargs):
+        """Create a shape from a boolean operation on the polygons of two shapes, using `boolean_cache` if set.
+
+        """
+        cache = self.boolean_cache
+        if cache is None:
+            return type(self)(operation(self._get_poly(), other._get_poly()), **kwargs)
+
+        key = (type(self), operation, self._geometry_version, other._geometry_version)
+        result = cache._get(key)
+        if result is None:
+            result = type(self)(operation(self._get_poly(), other._get_poly()))
+            # Triangulate once, so that all copies share the triangulation.
+            result._get_triangulation()
+            cache._put(key, result)
+        result = result.copy()
+        result._set_attributes(**kwargs)
+        return result
 
     def __iadd__(self, other):
         self.translate(other)
@@ -472,19 +1732,1401 @@ class Shape:
         return self
 
     def __imul__(self, other):
-        if isinstance(other, int) or isinstance(other, float):
-            self.poly.scale(other, other)
-        elif len(other) == 2:
-            self.poly.scale(*other)
-        return self
+        return self.scale(other)
 
     def __itruediv__(self, other):
-        if isinstance(other, int) or isinstance(other, float):
-            self.poly.scale(1/other, 1/other)
-        elif len(other) == 2:
-            self.poly.scale(1/other[0], 1/other[1])
-        return self
+        return self.scale(1 / np.asarray(other))
 
     __idiv__ = __itruediv__
 
     position = center
+
+
+class BooleanCache:
+    """Least-recently-used cache for the results of boolean operations between shapes.
+
+    Set |Shape.boolean_cache| to an instance to enable caching.
+    Results are keyed on the geometry of the operands, so a cached result is only used while neither operand changed,
+    and is returned as a copy, which can be modified freely.
+
+    Parameters
+    ----------
+    maxsize : int, optional
+        Maximum number of results to keep.
+
+    Attributes
+    ----------
+    hits : int
+        Number of operations answered from the cache.
+    misses : int
+        Number of operations that had to be computed.
+
+    """
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._results = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key):
+        result = self._results.get(key)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._results.move_to_end(key)
+        return result
+
+    def _put(self, key, result):
+        self._results[key] = result
+        while len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+
+    def clear(self):
+        """Remove all results, and reset the counters.
+
+        """
+        self._results.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._results)
+
+
+class FrameStats:
+    """Counts and timings of the work done by pyglet2d, frame by frame, to find where the time goes.
+
+    Instrumentation is enabled by setting ``Shape.stats`` to an instance,
+    and |FrameStats.end_frame| should be called once per frame (e.g., at the end of the window's ``on_draw`` handler).
+    While ``Shape.stats`` is None, the only cost is one check per instrumented call.
+
+    The categories recorded are:
+
+    - ``'draw'``: calls to the ``draw`` method of shapes, |ShapeBatch| and |InstancedShape|.
+    - ``'upload'``: vertex lists created, or whose vertices were uploaded again.
+    - ``'vertex_building'``: conversions of vertices to the format uploaded to OpenGL.
+    - ``'uploaded_vertices'``: number of vertices converted (counted, not timed).
+    - ``'transform'``: calls to |Shape.translate|, |Shape.transform| (which |Shape.rotate|, |Shape.scale| and
+      ``Shape.flip`` use), ``Shape.flip_x`` and ``Shape.flip_y``, and shapes moved by |MotionSystem.update|.
+      |Shape.update| makes two, or one if the shape does not rotate.
+    - ``'boolean'``: boolean operations between shapes, and calls to |Shape.union_all| and ``Shape.difference_all``.
+    - ``'collision'``: calls to |Shape.overlaps|, ``Shape.covers`` and |Shape.collide|.
+    - ``'time_of_impact'``: calls to |Shape.time_of_impact| and ``Shape.time_to_boundary``.
+
+    Times of categories that use each other overlap: drawing includes uploading, which includes building vertices.
+
+    Parameters
+    ----------
+    on_frame : callable, optional
+        Called with the |FrameStats| at the end of each frame, before the counts are reset.
+    clock : callable, optional
+        Function returning the current time in seconds. :func:`time.perf_counter` by default.
+
+    Attributes
+    ----------
+    counts : :class:`~collections.Counter`
+        Number of calls (or of vertices, for ``'uploaded_vertices'``) in each category in the current frame.
+    times : :class:`~collections.Counter`
+        Time spent in each category in the current frame, in seconds.
+    total_counts, total_times : :class:`~collections.Counter`
+        Counts and times of all completed frames.
+    frames : int
+        Number of completed frames.
+
+    Examples
+    --------
+    ::
+
+        Shape.stats = FrameStats(on_frame=lambda stats: print(dict(stats.times)))
+
+    """
+    def __init__(self, on_frame=None, clock=time.perf_counter):
+        self.on_frame = on_frame
+        self.clock = clock
+        self.counts = Counter()
+        self.times = Counter()
+        self.total_counts = Counter()
+        self.total_times = Counter()
+        self.frames = 0
+
+    def record(self, category, start, n=1):
+        """Record `n` calls in a category, which started at time `start` (from `clock`) and have just finished.
+
+        """
+        self.times[category] += self.clock() - start
+        self.counts[category] += n
+
+    def count(self, category, n=1):
+        """Count `n` events in a category, without timing them.
+
+        """
+        self.counts[category] += n
+
+    def end_frame(self):
+        """Finish the current frame: call `on_frame`, add the frame to the totals, and reset the counts and times.
+
+        """
+        if self.on_frame is not None:
+            self.on_frame(self)
+        self.total_counts.update(self.counts)
+        self.total_times.update(self.times)
+        self.counts = Counter()
+        self.times = Counter()
+        self.frames += 1
+
+
+class ShapeBatch:
+    """A collection of shapes that are drawn together, with a single call to a pyglet |Batch|.
+
+    The vertex lists of member shapes are allocated from the batch,
+    so their vertices live in shared buffers.
+    Shapes that are not `enabled` stay in the batch but are not drawn.
+
+    Parameters
+    ----------
+    shapes : iterable of |Shape|, optional
+        Initial members.
+    batch : |Batch|, optional
+        A pyglet batch to allocate from, for example one that is shared with sprites or labels.
+        If not passed, a new one is created.
+
+    Attributes
+    ----------
+    batch : |Batch|
+        The underlying pyglet batch.
+
+    """
+    def __init__(self, shapes=(), batch=None):
+        if batch is None:
+            batch = _pyglet().graphics.Batch()
+        self.batch = batch
+        # Shapes are unhashable (they define equality), so they are keyed by id.
+        self._shapes = OrderedDict()
+        # Maps the keys of hidden shapes to the geometry version of their vertex list when they were hidden,
+        # to notice if it was uploaded again (with visible triangles) since.
+        self._hidden = {}
+        for shape in shapes:
+            self.add(shape)
+
+    def add(self, shape):
+        """Add a shape to the batch.
+
+        Parameters
+        ----------
+        shape : |Shape|
+
+        """
+        if id(shape) not in self._shapes:
+            shape._set_vertex_list(self.batch)
+            self._shapes[id(shape)] = shape
+        return self
+
+    def remove(self, shape):
+        """Remove a shape from the batch. It will get a standalone vertex list when next drawn.
+
+        Parameters
+        ----------
+        shape : |Shape|
+
+        """
+        del self._shapes[id(shape)]
+        self._hidden.pop(id(shape), None)
+        shape._release_vertex_list()
+        return self
+
+    @_instrumented('draw')
+    def draw(self, viewport=None):
+        """Draw all enabled shapes in the current OpenGL context.
+
+        Parameters
+        ----------
+        viewport : array-like, optional
+            The visible rectangle, as in |Shape.draw|.
+            If passed, shapes whose bounding boxes lie outside it are hidden like disabled shapes,
+            and their vertices are not uploaded until they are visible again.
+
+        """
+        for key, shape in self._shapes.items():
+            if shape.enabled and (viewport is None or _boxes_intersect(shape.bounds, viewport)):
+                shape._sync_vertex_list()
+                if key in self._hidden:
+                    _set_indices(shape._vertex_list, shape._triangle_indices)
+                    del self._hidden[key]
+            elif self._hidden.get(key) != shape._uploaded_geometry_version:
+                # Degenerate triangles are not rasterized.
+                shape._vertex_list.indices = (0,) * len(shape._triangle_indices)
+                self._hidden[key] = shape._uploaded_geometry_version
+        self.batch.draw()
+
+    def __iter__(self):
+        return iter(list(self._shapes.values()))
+
+    def __len__(self):
+        return len(self._shapes)
+
+    def __contains__(self, shape):
+        return id(shape) in self._shapes
+
+
+class InstancedShape:
+    """Many copies of a template shape, which differ only in position, rotation, scale, and color.
+
+    The template's triangles are uploaded once, relative to its center.
+    Each copy is stored as one row of `instances`, and is drawn by setting the modelview matrix and the color,
+    so only a few numbers per copy are sent to OpenGL every frame, regardless of the number of vertices.
+
+    Parameters
+    ----------
+    template : |Shape|
+        The shape to copy. Its current geometry and color are used; later changes to it are ignored.
+    positions : array-like, optional
+        Centers of the initial copies, one ``[x, y]`` row per copy.
+    angles : array-like, optional
+        Rotation of each copy relative to the template, in radians counter-clockwise.
+    scales : array-like, optional
+        Scale factor of each copy relative to the template.
+    colors : array-like, optional
+        Color of each copy, in R, G, B format. Defaults to the template's color.
+
+    Attributes
+    ----------
+    instances : |array|
+        Structured array with the fields ``'position'``, ``'angle'``, ``'scale'``, and ``'color'``, one row per copy.
+        It is a view of a larger buffer, so it changes when copies are added or removed.
+        The properties `positions`, `angles`, `scales`, and `colors` are views of its fields,
+        and can be modified in place.
+    enabled : bool
+        If False, the copies will not be drawn.
+
+    """
+    instance_dtype = np.dtype([('position', np.float32, 2), ('angle', np.float32), ('scale', np.float32), ('color', np.uint8, 3)])
+
+    def __init__(self, template, positions=(), angles=None, scales=None, colors=None):
+        self._template_polygon = template.poly
+        self._template_polygon.shift(*-template.center)
+        self._local_vertices = np.reshape(template._gl_vertices, (-1, 2)) - template.center
+        # Radius of a circle around the center that contains the template, for culling.
+        self._radius = float(np.max(np.hypot(*self._local_vertices.T)))
+        self._triangle_indices = template._triangle_indices
+        self._color = template.colors[template._color]
+        self._allocated_vertex_list = None
+
+        self.instances = np.zeros(0, dtype=self.instance_dtype)
+        self.extend(positions, angles, scales, colors)
+        self.enabled = True
+
+    @property
+    def instances(self):
+        return self._buffer[:self._count]
+
+    @instances.setter
+    def instances(self, value):
+        self._buffer = np.asarray(value, dtype=self.instance_dtype).reshape(-1)
+        self._count = len(self._buffer)
+
+    @property
+    def positions(self):
+        return self.instances['position']
+
+    @property
+    def angles(self):
+        return self.instances['angle']
+
+    @property
+    def scales(self):
+        return self.instances['scale']
+
+    @property
+    def colors(self):
+        return self.instances['color']
+
+    def append(self, position, angle=0, scale=1, color=None):
+        """Add a copy.
+
+        Parameters
+        ----------
+        position : array-like
+        angle : float, optional
+        scale : float, optional
+        color : tuple of int, optional
+            Defaults to the template's color.
+
+        """
+        return self.extend([position], [angle], [scale], None if color is None else [color])
+
+    def extend(self, positions, angles=None, scales=None, colors=None):
+        """Add many copies.
+
+        Copies are stored in a buffer that grows geometrically, so adding them one at a time takes linear time overall.
+
+        Parameters
+        ----------
+        positions : array-like
+            Centers of the copies, one ``[x, y]`` row per copy.
+        angles : array-like, optional
+        scales : array-like, optional
+        colors : array-like, optional
+            Default to the template's color.
+
+        """
+        positions = np.reshape(positions, (-1, 2))
+        start = self._count
+        stop = start + len(positions)
+        if stop > len(self._buffer):
+            buffer = np.zeros(max(stop, 2 * len(self._buffer)), dtype=self.instance_dtype)
+            buffer[:start] = self._buffer[:start]
+            self._buffer = buffer
+        added = self._buffer[start:stop]
+        added['position'] = positions
+        added['angle'] = 0 if angles is None else angles
+        added['scale'] = 1 if scales is None else scales
+        added['color'] = self._color if colors is None else colors
+        self._count = stop
+        return self
+
+    def remove(self, index):
+        """Remove a copy.
+
+        Parameters
+        ----------
+        index : int or array-like
+            Index of the copy (or copies) to remove, i.e., a row of `instances`.
+
+        """
+        self.instances = np.delete(self.instances, index)
+        return self
+
+    def enable(self, enabled):
+        """Set whether the copies should be drawn.
+
+        Parameters
+        ----------
+        enabled : bool
+
+        """
+        self.enabled = enabled
+        return self
+
+    @_instrumented('draw')
+    def draw(self, viewport=None):
+        """Draw all copies in the current OpenGL context.
+
+        Parameters
+        ----------
+        viewport : array-like, optional
+            The visible rectangle, as in |Shape.draw|.
+            If passed, copies that lie outside it (tested with a bounding circle) are skipped.
+
+        """
+        if not self.enabled:
+            return
+        gl = _pyglet().gl
+        vertex_list = self._vertex_list
+        instances = self.instances
+        if viewport is not None:
+            (x_min, y_min), (x_max, y_max) = viewport
+            x, y = instances['position'].T
+            radii = np.abs(instances['scale']) * self._radius
+            visible = (x + radii >= x_min) & (x - radii <= x_max) & (y + radii >= y_min) & (y - radii <= y_max)
+            instances = instances[visible]
+        for (x, y), angle, scale, color in zip(instances['position'].tolist(), np.degrees(instances['angle']).tolist(),
+                                               instances['scale'].tolist(), instances['color'].tolist()):
+            gl.glPushMatrix()
+            gl.glTranslatef(x, y, 0)
+            gl.glRotatef(angle, 0, 0, 1)
+            gl.glScalef(scale, scale, 1)
+            gl.glColor3ub(*color)
+            vertex_list.draw(gl.GL_TRIANGLES)
+            gl.glPopMatrix()
+
+    @property
+    def _vertex_list(self):
+        if self._allocated_vertex_list is None:
+            self._allocated_vertex_list = _pyglet().graphics.vertex_list_indexed(
+                len(self._local_vertices), self._triangle_indices, ('v2f', self._local_vertices.ravel().tolist()))
+        return self._allocated_vertex_list
+
+    def __getitem__(self, index):
+        """Create a standalone |Shape| equivalent to a copy.
+
+        """
+        position, angle, scale, color = self.instances[index].tolist()
+        shape = Shape(Polygon(self._template_polygon), color=tuple(color))
+        return shape.scale(scale, center=[0, 0]).rotate(angle, center=[0, 0]).translate(position)
+
+    def __len__(self):
+        return len(self.instances)
+
+
+class MotionSystem:
+    """Motion state of many shapes, stored as arrays and advanced with vectorized operations.
+
+    The vertices, velocities, and angular velocities of member shapes are packed into shared arrays,
+    and each shape's own storage becomes a view into them.
+    Thus the shapes can still be used (and their velocities changed) individually,
+    while |MotionSystem.update| moves all of them at once.
+    Members must keep the same number of vertices while in the system,
+    so circles with adaptive level of detail (see |Shape.circle|) keep their current number of vertices once added.
+
+    Parameters
+    ----------
+    shapes : iterable of |Shape|, optional
+        Initial members.
+
+    Attributes
+    ----------
+    velocities : |array|
+        Velocities of the members, one row per shape, in the order they were added.
+        Writing to this array changes the shapes' velocities.
+    angular_velocities : |array|
+        Angular velocities of the members.
+        Writing to this array changes the shapes' angular velocities.
+
+    """
+    def __init__(self, shapes=()):
+        self._shapes = []
+        self._index = {}
+        self._offsets = [0]
+        self._points = np.empty((0, 2))
+        self._motion = np.empty((0, 3))
+        self._layout = None
+        for shape in shapes:
+            self.add(shape)
+
+    @property
+    def velocities(self):
+        return self._motion[:len(self._shapes), :2]
+
+    @property
+    def angular_velocities(self):
+        return self._motion[:len(self._shapes), 2]
+
+    def add(self, shape):
+        """Add a shape to the system.
+
+        Parameters
+        ----------
+        shape : |Shape|
+
+        """
+        if id(shape) in self._index:
+            return self
+        if not len(self._shapes):
+            self._points = np.empty((0, 2), dtype=shape._points.dtype)
+        elif shape._points.dtype != self._points.dtype:
+            raise ValueError('All shapes in a MotionSystem must have the same dtype.')
+
+        start = self._offsets[-1]
+        stop = start + len(shape)
+        self._reserve(stop, len(self._shapes) + 1)
+        self._points[start:stop] = shape._points
+        self._motion[len(self._shapes)] = shape._motion
+        self._index[id(shape)] = len(self._shapes)
+        self._shapes.append(shape)
+        self._offsets.append(stop)
+        self._bind(len(self._shapes) - 1)
+        self._layout = None
+        return self
+
+    def remove(self, shape):
+        """Remove a shape from the system, giving it back its own storage.
+
+        To remove many shapes, |MotionSystem.remove_many| is faster.
+
+        Parameters
+        ----------
+        shape : |Shape|
+
+        """
+        return self.remove_many([shape])
+
+    def remove_many(self, shapes):
+        """Remove shapes from the system, giving them back their own storage.
+
+        The shared arrays are compacted once, in place, and only the members after the first removed one are moved.
+
+        Parameters
+        ----------
+        shapes : iterable of |Shape|
+
+        """
+        indices = sorted({self._index[id(shape)] for shape in shapes})
+        if not indices:
+            return self
+        for i in indices:
+            shape = self._shapes[i]
+            del self._index[id(shape)]
+            shape._points = shape._points.copy()
+            shape._motion = shape._motion.copy()
+
+        n_shapes = len(self._shapes)
+        keep = np.ones(n_shapes, dtype=bool)
+        keep[indices] = False
+        offsets = np.array(self._offsets)
+        counts = np.diff(offsets)
+        kept_points = self._points[:offsets[-1]][np.repeat(keep, counts)]
+        self._points[:len(kept_points)] = kept_points
+        kept_motion = self._motion[:n_shapes][keep]
+        self._motion[:len(kept_motion)] = kept_motion
+        self._shapes = [shape for shape, kept in zip(self._shapes, keep.tolist()) if kept]
+        self._offsets = np.concatenate([[0], np.cumsum(counts[keep])]).tolist()
+        self._layout = None
+
+        for i in range(indices[0], len(self._shapes)):
+            self._index[id(self._shapes[i])] = i
+            self._bind(i)
+        return self
+
+    def update(self, dt):
+        """Move all member shapes forward according to their velocities.
+
+        Gives the same result as calling |Shape.update| on each shape.
+
+        Parameters
+        ----------
+        dt : float
+
+        """
+        if not self._shapes:
+            return
+        stats = Shape.stats
+        if stats is not None:
+            start = stats.clock()
+        starts, counts = self._get_layout()
+        n_shapes = len(self._shapes)
+        points = self._points[:self._offsets[-1]]
+        motion = self._motion[:n_shapes]
+
+        translations = dt * motion[:, :2]
+        points += np.repeat(translations, counts, axis=0)
+
+        # Rotate each shape about the center of its bounding box, as Shape.rotate does.
+        shape_centers = self._bounding_box_centers()
+        angles = dt * motion[:, 2]
+        shape_cos, shape_sin = np.cos(angles), np.sin(angles)
+        centers = np.repeat(shape_centers, counts, axis=0)
+        cos = np.repeat(shape_cos, counts)
+        sin = np.repeat(shape_sin, counts)
+        relative = points - centers
+        points[:, 0] = centers[:, 0] + cos * relative[:, 0] - sin * relative[:, 1]
+        points[:, 1] = centers[:, 1] + sin * relative[:, 0] + cos * relative[:, 1]
+
+        # Each shape moved by x -> rotation.dot(x + translation - center) + center.
+        rotations = np.stack([shape_cos, -shape_sin, shape_sin, shape_cos], axis=1).reshape(-1, 2, 2)
+        offsets = np.einsum('nij,nj->ni', rotations, translations - shape_centers) + shape_centers
+        for shape, rotation, offset in zip(self._shapes, rotations, offsets):
+            shape._geometry_changed(rotation, offset)
+        if stats is not None:
+            # Each shape counts as one transformation.
+            stats.record('transform', start, n_shapes)
+
+    def _bounding_box_centers(self):
+        """The center of the bounding box of each member, as an array.
+
+        """
+        if not self._shapes:
+            return np.empty((0, 2))
+        starts = self._get_layout()[0]
+        points = self._points[:self._offsets[-1]]
+        return (np.minimum.reduceat(points, starts) + np.maximum.reduceat(points, starts)) / 2
+
+    def _get_layout(self):
+        if self._layout is None:
+            offsets = np.array(self._offsets)
+            self._layout = offsets[:-1], np.diff(offsets)
+        return self._layout
+
+    def _reserve(self, n_points, n_shapes):
+        """Grow the shared arrays (geometrically) if they are too small, and point the members at the new ones.
+
+        """
+        if n_points <= len(self._points) and n_shapes <= len(self._motion):
+            return
+        points = np.empty((max(n_points, 2 * len(self._points)), 2), dtype=self._points.dtype)
+        points[:self._offsets[-1]] = self._points[:self._offsets[-1]]
+        motion = np.empty((max(n_shapes, 2 * len(self._motion)), 3))
+        motion[:len(self._shapes)] = self._motion[:len(self._shapes)]
+        self._points = points
+        self._motion = motion
+        for i in range(len(self._shapes)):
+            self._bind(i)
+
+    def _bind(self, i):
+        shape = self._shapes[i]
+        shape._points = self._points[self._offsets[i]:self._offsets[i + 1]]
+        shape._motion = self._motion[i]
+        # The vertex count of members is fixed.
+        shape._tolerance = None
+
+    def __iter__(self):
+        return iter(list(self._shapes))
+
+    def __len__(self):
+        return len(self._shapes)
+
+    def __contains__(self, shape):
+        return id(shape) in self._index
+
+
+class Simulation:
+    """Fixed-timestep simulation of moving shapes, independent of the frame rate.
+
+    |Simulation.update| is meant to be called once per frame with the time elapsed.
+    It advances the shapes in steps of a fixed `timestep`,
+    so that the results do not depend on the frame rate, and the cost of simulation does not grow with it.
+    If frames take so long that more than `max_steps` steps would be needed, the extra time is dropped,
+    so that a heavy scene slows down rather than falling further and further behind.
+    |Simulation.draw| draws the shapes between their last two steps, according to the time left over,
+    so that motion looks smooth even though steps and frames do not line up.
+
+    Parameters
+    ----------
+    shapes : |MotionSystem| or iterable of |Shape|
+        The shapes to simulate. A |MotionSystem| moves them with vectorized operations;
+        otherwise, |Shape.update| is called on each shape.
+    timestep : float, optional
+        Duration of a step.
+    max_steps : int, optional
+        Maximum number of steps per call to |Simulation.update|.
+    on_step : callable, optional
+        Called with `timestep` after each step, for example to respond to collisions.
+
+    Attributes
+    ----------
+    time : float
+        Total simulated time.
+    alpha : float
+        Time accumulated towards the next step, as a fraction of `timestep`. Read-only.
+
+    Examples
+    --------
+    ::
+
+        simulation = Simulation(MotionSystem(shapes), on_step=handle_collisions)
+        pyglet.clock.schedule(simulation.update)
+        window.set_handler('on_draw', simulation.draw)
+
+    """
+    def __init__(self, shapes, timestep=1 / 120, max_steps=5, on_step=None):
+        self.shapes = shapes
+        self.timestep = timestep
+        self.max_steps = max_steps
+        self.on_step = on_step
+        self.time = 0.0
+        self._accumulator = 0.0
+        self._last_step = None
+
+    @property
+    def alpha(self):
+        return self._accumulator / self.timestep
+
+    def update(self, dt):
+        """Advance the simulation by as many steps as fit in the time elapsed, up to `max_steps`.
+
+        Parameters
+        ----------
+        dt : float
+            Time elapsed since the last call.
+
+        Returns
+        -------
+        int
+            Number of steps taken.
+
+        """
+        self._accumulator += dt
+        steps = int(self._accumulator / self.timestep)
+        if steps > self.max_steps:
+            steps = self.max_steps
+            self._accumulator = steps * self.timestep
+        for i in range(steps):
+            if i == steps - 1:
+                self._last_step = self._motion_state()
+            self._step()
+        self._accumulator = max(self._accumulator - steps * self.timestep, 0.0)
+        return steps
+
+    def _step(self):
+        if isinstance(self.shapes, MotionSystem):
+            self.shapes.update(self.timestep)
+        else:
+            for shape in self.shapes:
+                shape.update(self.timestep)
+        self.time += self.timestep
+        if self.on_step is not None:
+            self.on_step(self.timestep)
+
+    def _motion_state(self):
+        """The members, the centers they rotate about in a step, and their motion (velocity and angular velocity).
+
+        """
+        if isinstance(self.shapes, MotionSystem):
+            shapes = list(self.shapes)
+            centers = self.shapes._bounding_box_centers()
+            motion = self.shapes._motion[:len(shapes)].copy()
+        else:
+            shapes = list(self.shapes)
+            centers = np.array([shape._bounding_box_center for shape in shapes]).reshape(-1, 2)
+            motion = np.array([shape._motion for shape in shapes]).reshape(-1, 3)
+        # A step translates each shape, then rotates it about its translated bounding box center.
+        return shapes, centers + self.timestep * motion[:, :2], motion
+
+    def draw(self):
+        """Draw the shapes, interpolated between their last two steps, in the current OpenGL context.
+
+        Each shape is drawn with its own model matrix, even if it belongs to a |ShapeBatch|.
+        Shapes added since the last step are drawn where they are.
+
+        """
+        gl = _pyglet().gl
+        for shape, matrix in self._interpolations():
+            if shape.enabled and matrix is not None:
+                gl.glPushMatrix()
+                gl.glMultMatrixf(_gl_matrix(matrix))
+                shape.draw()
+                gl.glPopMatrix()
+            else:
+                shape.draw()
+
+    def _interpolations(self):
+        """Yield each shape, with the matrix that moves it back from its last step to the current time, if any.
+
+        """
+        shapes = list(self.shapes)
+        stepped = self._last_step[0] if self._last_step is not None else None
+        if stepped is None or len(stepped) != len(shapes) or any(a is not b for a, b in zip(stepped, shapes)):
+            for shape in shapes:
+                yield shape, None
+            return
+
+        _, centers, motion = self._last_step
+        # Undo the part of the last step that corresponds to the time left over.
+        remaining = (1 - min(self.alpha, 1)) * self.timestep
+        angles = -remaining * motion[:, 2]
+        cos, sin = np.cos(angles), np.sin(angles)
+        rotations = np.stack([np.stack([cos, -sin], axis=1), np.stack([sin, cos], axis=1)], axis=1)
+        offsets = centers - np.einsum('nij,nj->ni', rotations, centers) - remaining * motion[:, :2]
+        for shape, rotation, offset in zip(shapes, rotations, offsets):
+            yield shape, np.column_stack([rotation, offset])
+
+
+class SpatialIndex:
+    """Uniform grid over shapes, to find overlapping shapes without testing every pair.
+
+    Each shape is registered in the grid cells covered by its bounding box.
+    Queries first collect the shapes in the relevant cells,
+    and the exact (and slower) |Shape.overlaps| test is only run for those whose bounding boxes intersect.
+
+    The index does not notice on its own when its shapes move.
+    Call |SpatialIndex.update| after moving them (e.g., once per frame);
+    it only re-registers shapes whose geometry changed.
+
+    Parameters
+    ----------
+    cell_size : float
+        Width and height of the grid cells.
+        A good choice is about the size of a typical shape.
+    shapes : iterable of |Shape|, optional
+        Initial members.
+
+    """
+    def __init__(self, cell_size, shapes=()):
+        self.cell_size = cell_size
+        self._cells = {}
+        # Maps id(shape) to [shape, geometry version, bounds, cell range, order of insertion].
+        self._entries = OrderedDict()
+        self._serials = count()
+        for shape in shapes:
+            self.add(shape)
+
+    def add(self, shape):
+        """Add a shape to the index.
+
+        Parameters
+        ----------
+        shape : |Shape|
+
+        """
+        if id(shape) not in self._entries:
+            bounds = shape.bounds
+            cell_range = self._cell_range(bounds)
+            self._entries[id(shape)] = [shape, shape._geometry_version, bounds, cell_range, next(self._serials)]
+            for cell in self._iter_cells(cell_range):
+                self._cells.setdefault(cell, {})[id(shape)] = shape
+        return self
+
+    def remove(self, shape):
+        """Remove a shape from the index.
+
+        Parameters
+        ----------
+        shape : |Shape|
+
+        """
+        entry = self._entries.pop(id(shape))
+        self._unregister(shape, entry[3])
+        return self
+
+    def update(self, shape=None):
+        """Re-register shapes that moved since they were last registered.
+
+        Parameters
+        ----------
+        shape : |Shape|, optional
+            The shape to update.
+            If not passed, all shapes in the index are checked.
+
+        """
+        entries = self._entries.values() if shape is None else [self._entries[id(shape)]]
+        for entry in entries:
+            shape = entry[0]
+            if entry[1] == shape._geometry_version:
+                continue
+            bounds = shape.bounds
+            cell_range = self._cell_range(bounds)
+            if cell_range != entry[3]:
+                self._unregister(shape, entry[3])
+                for cell in self._iter_cells(cell_range):
+                    self._cells.setdefault(cell, {})[id(shape)] = shape
+            entry[1:4] = shape._geometry_version, bounds, cell_range
+        return self
+
+    def query_overlaps(self, shape):
+        """Find the shapes in the index that overlap a shape.
+
+        Parameters
+        ----------
+        shape : |Shape|
+            A shape, which need not be in the index.
+
+        Returns
+        -------
+        list of |Shape|
+
+        """
+        return [other for other in self._candidates(shape.bounds) if other is not shape and shape.overlaps(other)]
+
+    def query_point(self, point):
+        """Find the shapes in the index that contain a point.
+
+        Parameters
+        ----------
+        point : array-like
+
+        Returns
+        -------
+        list of |Shape|
+
+        """
+        point = np.asarray(point, dtype=float).reshape(1, 2)
+        return [shape for shape in self._candidates(np.concatenate([point, point])) if shape.contains_points(point)[0]]
+
+    def query_points(self, points):
+        """Find which shapes in the index contain each of an array of points.
+
+        Parameters
+        ----------
+        points : array-like
+            An array of points, with x and y columns.
+
+        Returns
+        -------
+        |array|
+            A boolean array with a row per point and a column per shape, in the order the shapes were added.
+
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        result = np.zeros((len(points), len(self)), dtype=bool)
+        rows = np.flatnonzero(np.all(np.isfinite(points), axis=1))
+        if not len(rows):
+            return result
+        # Group the points by cell, and only test each shape against the points in the cells it is in.
+        cells, inverse = np.unique(np.floor_divide(points[rows], self.cell_size).astype(int), axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        groups = np.split(rows[np.argsort(inverse, kind='stable')], np.cumsum(np.bincount(inverse))[:-1])
+        candidates = {}
+        for cell, group in zip(map(tuple, cells.tolist()), groups):
+            for key in self._cells.get(cell, ()):
+                candidates.setdefault(key, []).append(group)
+        columns = {key: i for i, key in enumerate(self._entries)}
+        for key, groups in candidates.items():
+            candidate_rows = np.concatenate(groups)
+            result[candidate_rows, columns[key]] = self._entries[key][0].contains_points(points[candidate_rows])
+        return result
+
+    def query_nearest(self, points):
+        """Find the shape in the index whose center is nearest to each of an array of points.
+
+        Parameters
+        ----------
+        points : array-like
+            An array of points, with x and y columns.
+
+        Returns
+        -------
+        indices : |array|
+            For each point, the position of the nearest shape in the order the shapes were added.
+        distances : |array|
+            For each point, the distance to the center of the nearest shape.
+
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        if not len(self):
+            raise ValueError('The index is empty.')
+        centers = np.array([shape.center for shape in self])
+        # Empty shapes have no center, and are only nearest if all shapes are empty, at an infinite distance.
+        centers[np.isnan(centers)] = np.inf
+        indices = np.empty(len(points), dtype=int)
+        distances = np.empty(len(points))
+        for chunk in _chunks(np.arange(len(points)), len(centers)):
+            squared = np.sum((points[chunk, np.newaxis] - centers) ** 2, axis=2)
+            indices[chunk] = np.argmin(squared, axis=1)
+            distances[chunk] = np.sqrt(squared[np.arange(len(chunk)), indices[chunk]])
+        return indices, distances
+
+    def query_rectangle(self, vertices):
+        """Find the shapes in the index that overlap an axis-aligned rectangle.
+
+        Parameters
+        ----------
+        vertices : array-like
+            An array containing the ``[x, y]`` positions of the bottom-left and top-right corners.
+
+        Returns
+        -------
+        list of |Shape|
+
+        """
+        bounds = np.asarray(vertices, dtype=float)
+        candidates = self._candidates(bounds)
+        if not candidates:
+            return []
+        # Shapes whose bounding box lies within the rectangle certainly overlap it.
+        rectangle = None
+        result = []
+        for shape in candidates:
+            shape_bounds = self._entries[id(shape)][2]
+            if np.all(shape_bounds[0] >= bounds[0]) and np.all(shape_bounds[1] <= bounds[1]):
+                result.append(shape)
+                continue
+            if rectangle is None:
+                rectangle = Shape.rectangle(bounds)
+            if rectangle.overlaps(shape):
+                result.append(shape)
+        return result
+
+    def draw(self, viewport):
+        """Draw the shapes in the index that are in a rectangle, in the current OpenGL context.
+
+        Only the grid cells covered by the rectangle are searched,
+        so the cost depends on the number of visible shapes rather than the size of the index.
+        Call |SpatialIndex.update| after moving shapes, so that they are found where they are.
+
+        Parameters
+        ----------
+        viewport : array-like
+            The visible rectangle, as ``[[x_min, y_min], [x_max, y_max]]`` (e.g., the window).
+
+        """
+        for shape in self._candidates(np.asarray(viewport, dtype=float)):
+            shape.draw()
+
+    def all_overlapping_pairs(self):
+        """Find all pairs of overlapping shapes in the index.
+
+        Returns
+        -------
+        list of tuple of |Shape|
+            Each pair is ordered as the shapes were added to the index.
+
+        """
+        return [(shape_a, shape_b) for shape_a, shape_b in self._candidate_pairs() if shape_a.overlaps(shape_b)]
+
+    def all_contacts(self):
+        """Find the contacts between all pairs of overlapping shapes in the index.
+
+        Returns
+        -------
+        list of tuple
+            ``(shape_a, shape_b, contact)`` for each overlapping pair, where `contact` is as returned by |Shape.collide|.
+            Each pair is ordered as the shapes were added to the index.
+
+        """
+        contacts = []
+        for shape_a, shape_b in self._candidate_pairs():
+            contact = shape_a.collide(shape_b)
+            if contact is not None:
+                contacts.append((shape_a, shape_b, contact))
+        return contacts
+
+    def _candidate_pairs(self):
+        """Pairs of shapes in the index whose bounding boxes intersect, ordered as the shapes were added.
+
+        """
+        candidates = set()
+        for cell in self._cells.values():
+            if len(cell) > 1:
+                entries = sorted((self._entries[key] for key in cell), key=lambda entry: entry[4])
+                candidates.update((a[4], b[4], id(a[0]), id(b[0])) for i, a in enumerate(entries) for b in entries[i + 1:])
+
+        for _, _, key_a, key_b in sorted(candidates):
+            shape_a, _, bounds_a = self._entries[key_a][:3]
+            shape_b, _, bounds_b = self._entries[key_b][:3]
+            if _boxes_intersect(bounds_a, bounds_b):
+                yield shape_a, shape_b
+
+    def all_impacts(self, dt, tolerance=0.01, max_iterations=100):
+        """Find all pairs of shapes in the index that collide within a time interval, as they move according to their velocities.
+
+        Pairs are found from the bounding boxes the shapes sweep over `dt`, without modifying the index,
+        and then checked with |Shape.time_of_impact|.
+
+        Parameters
+        ----------
+        dt : float
+            Length of the time interval to search.
+        tolerance : float, optional
+        max_iterations : int, optional
+            Passed to |Shape.time_of_impact|.
+
+        Returns
+        -------
+        list of tuple
+            ``(time, shape_a, shape_b)`` for each colliding pair, ordered by time of impact.
+            Each pair is ordered as the shapes were added to the index.
+
+        """
+        entries = list(self._entries.values())
+        swept_bounds = [entry[0]._swept_bounds(dt) for entry in entries]
+        cells = {}
+        for i, bounds in enumerate(swept_bounds):
+            for cell in self._iter_cells(self._cell_range(bounds)):
+                cells.setdefault(cell, []).append(i)
+        candidates = set()
+        for members in cells.values():
+            candidates.update((a, b) for k, a in enumerate(members) for b in members[k + 1:])
+
+        impacts = []
+        for a, b in sorted(candidates):
+            if _boxes_intersect(swept_bounds[a], swept_bounds[b]):
+                time = entries[a][0].time_of_impact(entries[b][0], dt, tolerance, max_iterations)
+                if time is not None:
+                    impacts.append((time, a, b))
+        return [(time, entries[a][0], entries[b][0]) for time, a, b in sorted(impacts)]
+
+    def _candidates(self, bounds):
+        """Shapes in the index whose bounding boxes intersect `bounds`, in the order they were added.
+
+        """
+        i0, j0, i1, j1 = cell_range = self._cell_range(bounds)
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(self._cells):
+            # Fewer cells are occupied than in the range, so look at those instead.
+            cells = [cell for cell in self._cells if i0 <= cell[0] <= i1 and j0 <= cell[1] <= j1]
+        else:
+            cells = self._iter_cells(cell_range)
+        keys = set()
+        for cell in cells:
+            keys.update(self._cells.get(cell, ()))
+        entries = sorted((self._entries[key] for key in keys), key=lambda entry: entry[4])
+        return [entry[0] for entry in entries if _boxes_intersect(entry[2], bounds)]
+
+    def _cell_range(self, bounds):
+        if not np.all(np.isfinite(bounds)):
+            # Empty shapes are in no cell.
+            return 0, 0, -1, -1
+        (i0, j0), (i1, j1) = np.floor_divide(bounds, self.cell_size).astype(int)
+        return i0, j0, i1, j1
+
+    @staticmethod
+    def _iter_cells(cell_range):
+        i0, j0, i1, j1 = cell_range
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                yield i, j
+
+    def _unregister(self, shape, cell_range):
+        for cell in self._iter_cells(cell_range):
+            del self._cells[cell][id(shape)]
+            if not self._cells[cell]:
+                del self._cells[cell]
+
+    def __iter__(self):
+        return iter([entry[0] for entry in self._entries.values()])
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, shape):
+        return id(shape) in self._entries
+
+
+def _gl_matrix(matrix):
+    """A 2D affine transformation, as the first two rows of its matrix, as a column-major 4x4 OpenGL matrix.
+
+    """
+    (a, b, x), (c, d, y) = matrix[:2].tolist()
+    return (ctypes.c_float * 16)(a, c, 0, 0, b, d, 0, 0, 0, 0, 1, 0, x, y, 0, 1)
+
+
+def _boxes_intersect(a, b):
+    return a[0][0] <= b[1][0] and b[0][0] <= a[1][0] and a[0][1] <= b[1][1] and b[0][1] <= a[1][1]
+
+
+def _chunks(items, n_others):
+    """Split `items` into chunks, to compare each chunk with `n_others` items in arrays of about `_MAX_PAIRS` pairs at most.
+
+    """
+    return np.array_split(items, max(1, len(items) * n_others // _MAX_PAIRS))
+
+
+def _vertex_edge_distance(points, starts, ends):
+    """Smallest distance from any of `points` to any of the segments from `starts` to `ends`.
+
+    """
+    directions = ends - starts
+    lengths = np.maximum(np.sum(directions ** 2, axis=1), np.finfo(float).tiny)
+    distance = np.inf
+    for chunk in _chunks(points, len(starts)):
+        offsets = chunk[:, np.newaxis] - starts
+        proportions = np.clip(np.sum(offsets * directions, axis=2) / lengths, 0, 1)
+        squared = np.sum((offsets - proportions[:, :, np.newaxis] * directions) ** 2, axis=2)
+        distance = min(distance, np.sqrt(np.min(squared)))
+    return distance
+
+
+def _outward_normals(points):
+    """Unit normals of the edges of a contour, pointing outwards, and the offset of each edge along its normal.
+
+    """
+    edges = np.roll(points, -1, axis=0) - points
+    normals = np.column_stack([edges[:, 1], -edges[:, 0]])
+    # Edge normals point outwards for counter-clockwise contours, i.e. if the signed area is positive.
+    if np.sum(points[:, 0] * np.roll(points[:, 1], -1) - np.roll(points[:, 0], -1) * points[:, 1]) < 0:
+        normals = -normals
+    lengths = np.hypot(normals[:, 0], normals[:, 1])
+    with np.errstate(invalid='ignore'):
+        normals = normals / lengths[:, np.newaxis]
+    normals[lengths == 0] = 0
+    return normals, np.sum(normals * points, axis=1)
+
+
+def _convex_contact(points, other_points):
+    """Contact between two convex contours, as returned by |Shape.collide|, using the separating axis theorem.
+
+    """
+    normals, offsets = _outward_normals(points)
+    other_normals, other_offsets = _outward_normals(other_points)
+    # The separation along an edge normal is how far the other contour's nearest vertex is beyond the edge.
+    separations = np.min(normals.dot(other_points.T), axis=1) - offsets
+    other_separations = np.min(other_normals.dot(points.T), axis=1) - other_offsets
+    edge, other_edge = np.argmax(separations), np.argmax(other_separations)
+    if separations[edge] > 0 or other_separations[other_edge] > 0:
+        return None
+
+    # The edge with the largest separation is the reference face, the other contour's most opposed edge is incident.
+    if other_separations[other_edge] > separations[edge] + 1e-9 * (1 + abs(separations[edge])):
+        reference, reference_edge, reference_normals = other_points, other_edge, other_normals
+        incident, incident_normals, sign = points, normals, -1
+        depth = -other_separations[other_edge]
+    else:
+        reference, reference_edge, reference_normals = points, edge, normals
+        incident, incident_normals, sign = other_points, other_normals, 1
+        depth = -separations[edge]
+    normal = reference_normals[reference_edge]
+    incident_edge = np.argmin(incident_normals.dot(normal))
+
+    # Clip the incident edge to the sides of the reference edge, and keep the points behind the reference edge.
+    start, end = reference[reference_edge], reference[(reference_edge + 1) % len(reference)]
+    tangent = end - start
+    segment = np.array([incident[incident_edge], incident[(incident_edge + 1) % len(incident)]])
+    for direction, offset in [(tangent, tangent.dot(start)), (-tangent, -tangent.dot(end))]:
+        distances = segment.dot(direction) - offset
+        if distances.max() < 0:
+            # The incident edge misses the reference edge entirely, so use the deepest vertex instead.
+            segment = incident[[np.argmin(incident.dot(normal))]]
+            break
+        if distances[0] * distances[1] < 0:
+            crossing = segment[0] + distances[0] / (distances[0] - distances[1]) * (segment[1] - segment[0])
+            segment[np.argmin(distances)] = crossing
+    contacts = segment[segment.dot(normal) - normal.dot(start) <= 1e-9 * (1 + depth)]
+    if not len(contacts):
+        contacts = segment[[np.argmin(segment.dot(normal))]]
+    return float(depth), sign * normal, contacts
+
+
+def _conservative_advancement(distance, speed, dt, tolerance, max_iterations):
+    """Find the first time in ``[0, dt]`` at which ``distance(t) <= tolerance``, or None.
+
+    `speed` bounds how fast the distance can decrease, so advancing by ``distance(t) / speed`` cannot skip a contact.
+
+    """
+    t = 0.0
+    for _ in range(max_iterations):
+        gap = distance(t)
+        if gap <= tolerance:
+            return t
+        if speed == 0:
+            return None
+        t += gap / speed
+        if t > dt:
+            return None
+    return t
+
+
+# Fields of a specification for Shape.from_dict that define the geometry.
+_GEOMETRY_FIELDS = frozenset(['center', 'radius', 'n_vertices', 'start_angle', 'vertices'])
+
+# Size of the blocks in which Shape.from_file reads files.
+_READ_SIZE = 65536
+
+
+def _spec_group(spec):
+    """The kind of shape a specification for Shape.from_dict describes, as a hashable key for ``Shape._from_spec_group``.
+
+    Specifications that are not handled in groups (adaptive circles, polygons with holes, or invalid ones) give None.
+
+    """
+    if spec.keys() - _GEOMETRY_FIELDS - {'color', 'velocity', 'angular_velocity', 'colors'}:
+        return None
+    center, radius = spec.get('center'), spec.get('radius')
+    if center and radius:
+        if 'vertices' in spec:
+            return None
+        return 'circle', int(spec.get('n_vertices', 50)), spec.get('start_angle', 0)
+    vertices = spec.get('vertices')
+    if not vertices or 'n_vertices' in spec or 'start_angle' in spec:
+        return None
+    if len(vertices) == 2:
+        return 'rectangle', 4, 0
+    if not all(len(vertex) == 2 for vertex in vertices):
+        return None
+    return 'polygon', len(vertices), 0
+
+
+def _iter_json_objects(file):
+    """Yield the JSON objects in a file that contains either a JSON array of them, or one per line, reading in blocks.
+
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    exhausted = False
+    while True:
+        # Skip separators: whitespace, the commas of an array, and its brackets.
+        while position < len(buffer) and buffer[position] in ' \t\r\n,[]':
+            position += 1
+        if position < len(buffer):
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except ValueError:
+                if exhausted:
+                    raise
+            else:
+                yield item
+                continue
+        elif exhausted:
+            return
+        # The next object is incomplete: read another block.
+        block = file.read(_READ_SIZE)
+        exhausted = not block
+        buffer = buffer[position:] + block
+        position = 0
+
+
+# Scene files written by Shape.save_scene start with a preamble: a magic string, and the offset and length
+# of a JSON header at the end of the file, which describes the arrays in between.
+_SCENE_MAGIC = b'PYGLET2D'
+_SCENE_VERSION = 1
+_SCENE_PREAMBLE = struct.Struct('<8sQQ')
+# Arrays start at multiples of this many bytes from the start of the file, so that their views are aligned.
+_SCENE_ALIGNMENT = 64
+
+
+def _align_scene(file, start):
+    """Pad a scene file being written with zeros up to the next array boundary, and return the offset from `start`.
+
+    """
+    padding = -(file.tell() - start) % _SCENE_ALIGNMENT
+    file.write(bytes(padding))
+    return file.tell() - start
+
+
+def _read_scene(file):
+    """Memory-map a scene file written by ``Shape.save_scene``, and return its header and a view of each array.
+
+    The mapping is copy-on-write, so that the arrays are writable but changes are not written to the file.
+
+    """
+    if isinstance(file, (str, os.PathLike)):
+        data = np.memmap(file, mode='c')
+    else:
+        position = file.tell()
+        try:
+            data = np.memmap(file, mode='c', offset=position)
+        except (AttributeError, OSError, ValueError):
+            file.seek(position)
+            data = np.frombuffer(bytearray(file.read()), dtype=np.uint8)
+    # Views of the mapping, as plain arrays, keep it open.
+    data = data.view(np.ndarray)
+
+    if len(data) < _SCENE_PREAMBLE.size:
+        raise ValueError('not a pyglet2d scene file')
+    magic, header_offset, header_length = _SCENE_PREAMBLE.unpack(data[:_SCENE_PREAMBLE.size].tobytes())
+    if magic != _SCENE_MAGIC:
+        raise ValueError('not a pyglet2d scene file')
+    header = json.loads(data[header_offset:header_offset + header_length].tobytes().decode())
+    if header['version'] > _SCENE_VERSION:
+        raise ValueError('unsupported scene file version: {}'.format(header['version']))
+
+    arrays = {}
+    for name, entry in header['arrays'].items():
+        dtype = np.dtype(entry['dtype'])
+        offset = entry['offset']
+        size = dtype.itemsize * int(np.prod(entry['shape']))
+        arrays[name] = data[offset:offset + size].view(dtype).reshape(entry['shape'])
+    return header, arrays
+
+
+def _polygon_from_buffers(buffers):
+    """Create a |Polygon| from the arrays returned by ``Shape._contour_buffers``.
+
+    """
+    points, offsets, holes = buffers
+    poly = Polygon()
+    for start, stop, hole in zip(offsets[:-1], offsets[1:], holes):
+        poly.addContour(points[start:stop], bool(hole))
+    return poly
+
+
+def _union_polygon(shapes, processes=None):
+    """The union of shapes as a |Polygon|, computed as described in |Shape.union_all|.
+
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+    shapes = [shape for shape in shapes if len(shape)]
+    buffers = [shape._contour_buffers() for shape in sorted(shapes, key=lambda shape: shape.bounds[0, 0])]
+    if processes > 1 and len(buffers) >= 4 * processes:
+        groups = [buffers[len(buffers) * i // processes:len(buffers) * (i + 1) // processes] for i in range(processes)]
+        with ProcessPoolExecutor(processes) as executor:
+            buffers = list(executor.map(_union_buffers, groups))
+    return _polygon_from_buffers(_union_buffers(buffers))
+
+
+def _union_buffers(buffers):
+    """Combine polygons, given as arrays, as a balanced tree of unions, and return the result as arrays.
+
+    This is run in worker processes by ``Shape.union_all``.
+
+    """
+    polygons = [_polygon_from_buffers(item) for item in buffers]
+    if not polygons:
+        polygons = [Polygon()]
+    while len(polygons) > 1:
+        polygons = [a | b for a, b in zip(polygons[::2], polygons[1::2])] + polygons[len(polygons) // 2 * 2:]
+    poly = polygons[0]
+    contours = [np.asarray(poly[i], dtype=float).reshape(-1, 2) for i in range(len(poly))]
+    points = np.concatenate(contours) if contours else np.empty((0, 2))
+    offsets = np.cumsum([0] + [len(contour) for contour in contours])
+    return points, offsets, np.array([poly.isHole(i) for i in range(len(poly))], dtype=bool)
@@ -0,0 +1,352 @@
+"""Headless benchmarks for pyglet2d.
+
+Graphics calls to pyglet are replaced by stand-ins that do nothing, as in the test suite (but cheaper than mocks),
+so the timings cover the Python and NumPy work done by pyglet2d but not OpenGL itself.
+The memory used per shape is measured with `tracemalloc`.
+Results are written as JSON, and can be compared with those of another version using ``--compare``.
+With ``--max-ratio``, the comparison fails if any benchmark got slower by more than that ratio.
+``benchmark_baseline.json`` holds the results of the current version, to compare changes against.
+
+"""
+from argparse import ArgumentParser
+from collections import OrderedDict
+from contextlib import contextmanager
+from types import SimpleNamespace
+from unittest.mock import patch
+import json
+import platform
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+import numpy as np
+import pyglet
+
+import pyglet2d
+from pyglet2d import Shape
+
+
+SHAPE_COUNTS = [10, 100, 1000]
+VERTEX_COUNTS = [4, 50, 200]
+REPEAT = 5
+MEMORY_SHAPES = 10000
+
+
+class NullVertexList:
+    def __init__(self, count, indices, *data):
+        self.count = count
+        self.indices = indices
+
+    def draw(self, mode):
+        pass
+
+    def delete(self):
+        pass
+
+
+def do_nothing(*args):
+    pass
+
+
+@contextmanager
+def mock_graphics():
+    graphics = SimpleNamespace(vertex_list_indexed=NullVertexList)
+    gl = SimpleNamespace(GL_TRIANGLES=4, glPushMatrix=do_nothing, glPopMatrix=do_nothing, glTranslatef=do_nothing,
+                         glRotatef=do_nothing, glScalef=do_nothing, glMultMatrixf=do_nothing, glColor3ub=do_nothing)
+    with patch.object(pyglet, 'graphics', graphics), patch.object(pyglet, 'gl', gl):
+        yield
+
+
+def make_shapes(n_shapes, n_vertices, seed=0):
+    random = np.random.RandomState(seed)
+    centers = random.uniform(0, 1000, (n_shapes, 2))
+    radii = random.uniform(10, 50, n_shapes)
+    return [Shape.regular_polygon(center, radius, n_vertices) for center, radius in zip(centers, radii)]
+
+
+def pairs_of(shapes):
+    return list(zip(shapes[::2], shapes[1::2]))
+
+
+def bench_circle(n_shapes, n_vertices):
+    centers = np.random.uniform(0, 1000, (n_shapes, 2))
+
+    def run():
+        for center in centers:
+            Shape.circle(center, 20, n_vertices=n_vertices)
+    return run
+
+
+def bench_regular_polygon(n_shapes, n_vertices):
+    centers = np.random.uniform(0, 1000, (n_shapes, 2))
+
+    def run():
+        for center in centers:
+            Shape.regular_polygon(center, 20, n_vertices, start_angle=0.5)
+    return run
+
+
+def bench_from_dict(n_shapes, n_vertices):
+    specs = [{'center': list(center), 'radius': 20, 'n_vertices': n_vertices, 'color': (255, 0, 0)}
+             for center in np.random.uniform(0, 1000, (n_shapes, 2)).tolist()]
+
+    def run():
+        for spec in specs:
+            Shape.from_dict(spec)
+    return run
+
+
+def bench_from_dicts(n_shapes, n_vertices):
+    specs = [{'center': list(center), 'radius': 20, 'n_vertices': n_vertices, 'color': (255, 0, 0)}
+             for center in np.random.uniform(0, 1000, (n_shapes, 2)).tolist()]
+
+    def run():
+        for _ in Shape.from_dicts(specs):
+            pass
+    return run
+
+
+def bench_load_scene(n_shapes, n_vertices):
+    file = tempfile.TemporaryFile()
+    Shape.save_scene(file, make_shapes(n_shapes, n_vertices))
+
+    def run():
+        file.seek(0)
+        Shape.load_scene(file)
+    return run
+
+
+def bench_translate(n_shapes, n_vertices):
+    shapes = make_shapes(n_shapes, n_vertices)
+
+    def run():
+        for shape in shapes:
+            shape.translate([1, 1])
+    return run
+
+
+def bench_rotate(n_shapes, n_vertices):
+    shapes = make_shapes(n_shapes, n_vertices)
+
+    def run():
+        for shape in shapes:
+            shape.rotate(0.1)
+    return run
+
+
+def bench_scale(n_shapes, n_vertices):
+    shapes = make_shapes(n_shapes, n_vertices)
+
+    def run():
+        for shape in shapes:
+            shape.scale(1.01)
+    return run
+
+
+def bench_draw_static(n_shapes, n_vertices):
+    shapes = make_shapes(n_shapes, n_vertices)
+
+    def run():
+        for shape in shapes:
+            shape.draw()
+    return run
+
+
+def bench_draw_moving(n_shapes, n_vertices):
+    shapes = make_shapes(n_shapes, n_vertices)
+
+    def run():
+        for shape in shapes:
+            shape.translate([1, 1])
+            shape.draw()
+    return run
+
+
+def bench_draw_culled(n_shapes, n_vertices):
+    # The world is ten times the width and height of the viewport, so about 1% of the shapes are visible.
+    index = pyglet2d.SpatialIndex(100, make_shapes(n_shapes, n_vertices))
+    viewport = [[0, 0], [100, 100]]
+
+    def run():
+        index.draw(viewport)
+    return run
+
+
+def bench_overlaps(n_shapes, n_vertices):
+    pairs = pairs_of(make_shapes(n_shapes, n_vertices))
+
+    def run():
+        for a, b in pairs:
+            a.overlaps(b)
+    return run
+
+
+def bench_covers(n_shapes, n_vertices):
+    pairs = pairs_of(make_shapes(n_shapes, n_vertices))
+
+    def run():
+        for a, b in pairs:
+            a.covers(b)
+    return run
+
+
+def bench_intersection(n_shapes, n_vertices):
+    pairs = pairs_of(make_shapes(n_shapes, n_vertices))
+
+    def run():
+        for a, b in pairs:
+            a & b
+    return run
+
+
+def bench_union(n_shapes, n_vertices):
+    pairs = pairs_of(make_shapes(n_shapes, n_vertices))
+
+    def run():
+        for a, b in pairs:
+            a | b
+    return run
+
+
+def bench_difference(n_shapes, n_vertices):
+    pairs = pairs_of(make_shapes(n_shapes, n_vertices))
+
+    def run():
+        for a, b in pairs:
+            a - b
+    return run
+
+
+def bench_union_all(n_shapes, n_vertices):
+    shapes = make_shapes(n_shapes, n_vertices)
+
+    def run():
+        Shape.union_all(shapes)
+    return run
+
+
+BENCHMARKS = OrderedDict([
+    ('circle', bench_circle),
+    ('regular_polygon', bench_regular_polygon),
+    ('from_dict', bench_from_dict),
+    ('from_dicts', bench_from_dicts),
+    ('load_scene', bench_load_scene),
+    ('translate', bench_translate),
+    ('rotate', bench_rotate),
+    ('scale', bench_scale),
+    ('draw_static', bench_draw_static),
+    ('draw_moving', bench_draw_moving),
+    ('draw_culled', bench_draw_culled),
+    ('overlaps', bench_overlaps),
+    ('covers', bench_covers),
+    ('intersection', bench_intersection),
+    ('union', bench_union),
+    ('difference', bench_difference),
+    ('union_all', bench_union_all),
+])
+
+
+def measure_memory(n_shapes, n_vertices):
+    """Bytes allocated per shape when creating `n_shapes` regular polygons, including their vertices.
+
+    """
+    centers = np.random.uniform(0, 1000, (n_shapes, 2))
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        shapes = [Shape.regular_polygon(center, 20, n_vertices) for center in centers]
+        return (tracemalloc.get_traced_memory()[0] - start) / len(shapes)
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmarks(names, shape_counts, vertex_counts, repeat):
+    results = []
+    with mock_graphics():
+        for name in names:
+            for n_shapes in shape_counts:
+                for n_vertices in vertex_counts:
+                    np.random.seed(0)
+                    run = BENCHMARKS[name](n_shapes, n_vertices)
+                    times = timeit.repeat(run, number=1, repeat=repeat)
+                    results.append({
+                        'name': name,
+                        'n_shapes': n_shapes,
+                        'n_vertices': n_vertices,
+                        'best': min(times),
+                        'mean': sum(times) / len(times),
+                        'best_per_shape': min(times) / n_shapes,
+                    })
+                    print('{name:>16} {n_shapes:>6} shapes {n_vertices:>4} vertices: {best:.6f} s'.format(**results[-1]),
+                          file=sys.stderr)
+
+        memory = []
+        for n_vertices in vertex_counts:
+            memory.append({'n_vertices': n_vertices, 'bytes_per_shape': measure_memory(MEMORY_SHAPES, n_vertices)})
+            print('{:>16} {n_vertices:>4} vertices: {bytes_per_shape:.0f} bytes per shape'.format('memory', **memory[-1]),
+                  file=sys.stderr)
+    return {
+        'pyglet2d': pyglet2d.__version__,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'repeat': repeat,
+        'results': results,
+        'memory': memory,
+    }
+
+
+def compare(results, baseline):
+    """Print the ratio of each time to the baseline's, and return the largest.
+
+    """
+    worst = 0
+    baseline_times = {(r['name'], r['n_shapes'], r['n_vertices']): r['best'] for r in baseline['results']}
+    print('Compared to pyglet2d {} (ratio of best times, < 1 is faster):'.format(baseline['pyglet2d']), file=sys.stderr)
+    for result in results['results']:
+        key = (result['name'], result['n_shapes'], result['n_vertices'])
+        if key in baseline_times:
+            ratio = result['best'] / baseline_times[key]
+            worst = max(worst, ratio)
+            print('{:>16} {:>6} shapes {:>4} vertices: {:.2f}'.format(*key + (ratio,)), file=sys.stderr)
+    baseline_memory = {r['n_vertices']: r['bytes_per_shape'] for r in baseline.get('memory', [])}
+    for result in results['memory']:
+        if result['n_vertices'] in baseline_memory:
+            print('{:>16} {:>4} vertices: {:.2f}'.format(
+                'memory', result['n_vertices'], result['bytes_per_shape'] / baseline_memory[result['n_vertices']]),
+                file=sys.stderr)
+    return worst
+
+
+def main(benchmarks=None, shapes=None, vertices=None, repeat=REPEAT, output=None, compare_to=None, max_ratio=None):
+    results = run_benchmarks(benchmarks or list(BENCHMARKS), shapes or SHAPE_COUNTS, vertices or VERTEX_COUNTS, repeat)
+    if output:
+        with open(output, 'w') as file:
+            json.dump(results, file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    if compare_to:
+        with open(compare_to) as file:
+            worst = compare(results, json.load(file))
+        if max_ratio is not None and worst > max_ratio:
+            sys.exit('A benchmark is {:.2f} times slower than in {}.'.format(worst, compare_to))
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Benchmarks for pyglet2d.')
+    parser.add_argument('benchmarks', nargs='*', metavar='benchmark',
+                        help='Benchmarks to run (default: all). Choices: {}.'.format(', '.join(BENCHMARKS)))
+    parser.add_argument('--shapes', type=int, nargs='+', help='Numbers of shapes (default: {}).'.format(SHAPE_COUNTS))
+    parser.add_argument('--vertices', type=int, nargs='+', help='Numbers of vertices per shape (default: {}).'.format(VERTEX_COUNTS))
+    parser.add_argument('--repeat', type=int, default=REPEAT, help='Number of repetitions; the best time is reported.')
+    parser.add_argument('--output', help='File to write the JSON results to (default: standard output).')
+    parser.add_argument('--compare', dest='compare_to', help='JSON results of a previous run to compare to.')
+    parser.add_argument('--max-ratio', type=float,
+                        help='Fail if a benchmark is slower than in the compared results by more than this ratio.')
+
+    args = parser.parse_args()
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error('unknown benchmarks: {}'.format(', '.join(sorted(unknown))))
+    main(**vars(args))
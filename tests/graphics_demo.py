@@ -6,7 +6,7 @@ import random
 import pyglet
 import numpy as np
 
-from pyglet2d import Shape
+from pyglet2d import Shape, MotionSystem, Simulation
 
 
 VELOCITY_RANGE = (-1000, 1000)
@@ -18,16 +18,12 @@ MAX_POLYGON_VERTICES = 12
 BUFFER = 5
 
 
-def draw(window, shapes):
+def draw(window, simulation):
     window.clear()
-    for shape in shapes:
-        shape.draw()
+    simulation.draw()
 
 
 def update(window, shapes, dt):
-    for shape in shapes:
-        shape.update(dt)
-
     bounce(window, shapes)
 
 
@@ -35,19 +31,19 @@ def bounce(window, shapes):
     circle = shapes[0]
     new_velocity = None
     new_position = None
-    if max(p[0] for p in circle.vertices) > window.width + 1:
+    if circle.bounds[1, 0] > window.width + 1:
         new_velocity = circle.velocity * [-1, 1]
         new_position = circle.center - [BUFFER, 0]
 
-    elif min(p[0] for p in circle.vertices) < -1:
+    elif circle.bounds[0, 0] < -1:
         new_velocity = circle.velocity * [-1, 1]
         new_position = circle.center + [BUFFER, 0]
 
-    elif max(p[1] for p in circle.vertices) > window.height + 1:
+    elif circle.bounds[1, 1] > window.height + 1:
         new_velocity = circle.velocity * [1, -1]
         new_position = circle.center - [0, BUFFER]
 
-    elif min(p[1] for p in circle.vertices) < -1:
+    elif circle.bounds[0, 1] < -1:
         new_velocity = circle.velocity * [1, -1]
         new_position = circle.center + [0, BUFFER]
 
@@ -147,9 +143,10 @@ def main(screen=None):
     for shape in shapes[1:]:
         shape.enable(False)
 
-    window.set_handlers(on_draw=partial(draw, window, shapes),
+    simulation = Simulation(MotionSystem(shapes), on_step=partial(update, window, shapes))
+    window.set_handlers(on_draw=partial(draw, window, simulation),
                         on_key_press=partial(on_key_press, shapes))
-    pyglet.clock.schedule(partial(update, window, shapes))
+    pyglet.clock.schedule(simulation.update)
     pyglet.app.run()
 
 if __name__ == '__main__':
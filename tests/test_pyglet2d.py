@@ -1,10 +1,17 @@
 from unittest.mock import Mock
+import io
+import json
+import os
+import subprocess
+import sys
 
 import numpy as np
 import pytest
 import pyglet
+from Polygon import Polygon
 
-from pyglet2d import Shape
+import pyglet2d
+from pyglet2d import Shape, BooleanCache, FrameStats, ShapeBatch, InstancedShape, MotionSystem, Simulation, SpatialIndex
 
 
 def vertex_list_side_effect(*args, **kwargs):
@@ -12,14 +19,22 @@ def vertex_list_side_effect(*args, **kwargs):
     mock_vertex_list_instance.draw = Mock(return_value=None)
     mock_vertex_list_instance.args = args
     mock_vertex_list_instance.kwargs = kwargs
+    mock_vertex_list_instance.start = 0
     return mock_vertex_list_instance
 
 
+def batch_side_effect(*args, **kwargs):
+    mock_batch_instance = Mock()
+    mock_batch_instance.add_indexed = Mock(side_effect=vertex_list_side_effect)
+    return mock_batch_instance
+
+
 @pytest.fixture(autouse=True)
 def mock_pyglet_graphics(monkeypatch):
     mock_vertex_list = Mock(side_effect=vertex_list_side_effect)
-    mock_graphics = Mock
+    mock_graphics = Mock()
     mock_graphics.vertex_list_indexed = mock_vertex_list
+    mock_graphics.Batch = Mock(side_effect=batch_side_effect)
     monkeypatch.setattr(pyglet, 'graphics', mock_graphics)
     mock_gl = Mock()
     mock_gl.attach_mock(Mock(name='GL_TRIANGLES'), 'GL_TRIANGLES')
@@ -72,6 +87,31 @@ def test_rectangle_from_dict():
     assert Shape.from_dict(spec) == Shape.rectangle(spec['vertices'])
 
 
+def test_circle_level_of_detail():
+    small = Shape.circle([0, 0], 1, tolerance=0.5)
+    assert len(small) == Shape.min_circle_vertices
+    circle = Shape.circle([0, 0], 100, tolerance=0.5)
+    assert len(circle) == 32
+    assert np.all(np.abs(circle.vertices) <= 100)
+    assert np.all(np.isclose(Shape.circle([0, 0], 100, tolerance=0.5).vertices, circle.vertices))
+
+    circle.draw()
+    circle.rotate(1).translate([5, 0])
+    assert len(circle) == 32
+    circle.scale(4)
+    assert len(circle) == 64
+    assert np.all(np.isclose(np.linalg.norm(circle.vertices - [5, 0], axis=1), 400))
+    assert circle._vertex_list.resize.call_args[0] == (65, 3 * 64)
+    assert circle._vertex_list.indices == list(circle._triangle_indices)
+    circle.draw()
+    assert not pyglet.gl.glMultMatrixf.called
+
+    circle.radius = 1
+    assert len(circle) == Shape.min_circle_vertices
+    circle.scale([2, 1]).scale(10)
+    assert len(circle) == Shape.min_circle_vertices
+
+
 def test_from_dict():
     spec = {
         'vertices': [[1, 0],
@@ -84,6 +124,89 @@ def test_from_dict():
     assert Shape.from_dict(spec) == Shape(spec['vertices'], color=spec['color'], velocity=spec['velocity'])
 
 
+SPECS = [
+    {'center': [0, 0], 'radius': 1},
+    {'vertices': [[0, 0], [2, 3]], 'color': [1, 2, 3]},
+    {'center': [1, 2], 'radius': 3, 'n_vertices': 6, 'start_angle': 0.5, 'velocity': [1, 2]},
+    {'vertices': [[0, 0], [4, 0], [1, 1], [0, 4]], 'colors': {'primary': [4, 5, 6], 'other': [7, 8, 9]}},
+    {'center': [5, 5], 'radius': 2, 'tolerance': 0.1},
+    {'center': [-1, 2], 'radius': 0.5, 'angular_velocity': 2},
+    {'vertices': [[-1, -1], [-3, 0]]},
+    {'vertices': [[1, 1], [5, 1], [3, 3], [3, 8]]},
+]
+
+
+def test_from_dicts():
+    shapes = list(Shape.from_dicts(SPECS))
+    assert list(Shape.from_dicts(iter(SPECS), chunk_size=3)) == shapes
+    assert len(shapes) == len(SPECS)
+    for shape, spec in zip(shapes, SPECS):
+        expected = Shape.from_dict(spec)
+        assert shape == expected
+        assert np.all(shape.vertices == expected.vertices)
+        assert shape.angular_velocity == expected.angular_velocity
+        assert shape._triangle_indices == expected._triangle_indices
+    assert shapes[0].vertices.base.base is shapes[5].vertices.base.base
+    assert shapes[1].color == (1, 2, 3)
+    shapes[0].translate([1, 1])
+    assert np.all(np.isclose(shapes[5].center, [-1, 2]))
+
+    with pytest.raises(TypeError):
+        list(Shape.from_dicts([{'vertices': [[0, 0], [1, 1]], 'size': 1}]))
+
+
+@pytest.mark.parametrize('ndjson', [False, True])
+def test_from_file(tmp_path, monkeypatch, ndjson):
+    monkeypatch.setattr(pyglet2d, '_READ_SIZE', 7)
+    if ndjson:
+        text = '\n'.join(json.dumps(spec) for spec in SPECS) + '\n'
+    else:
+        text = json.dumps(SPECS, indent=2)
+    path = tmp_path / 'specs.json'
+    path.write_text(text)
+    expected = [Shape.from_dict(spec) for spec in SPECS]
+    assert list(Shape.from_file(str(path), chunk_size=3)) == expected
+    assert list(Shape.from_file(io.StringIO(text))) == expected
+    assert list(Shape.from_file(io.StringIO('[]'))) == []
+    with pytest.raises(ValueError):
+        list(Shape.from_file(io.StringIO(text[:-5])))
+
+
+def test_save_and_load_scene(tmp_path):
+    shapes = [Shape.from_dict(spec) for spec in SPECS]
+    shapes.append(Shape.rectangle([[0, 0], [4, 4]]) - Shape.rectangle([[1, 1], [2, 2]]))
+    shapes[2].enabled = False
+    shapes[3].colors = {'primary': (1, 2, 3), 'other': (7, 8, 9)}
+    path = tmp_path / 'scene.bin'
+    Shape.save_scene(str(path), iter(shapes))
+
+    loaded = Shape.load_scene(str(path))
+    assert loaded == shapes
+    for shape, expected in zip(loaded, shapes):
+        assert np.all(shape.vertices == expected.vertices)
+        assert shape.angular_velocity == expected.angular_velocity
+        assert shape.enabled == expected.enabled
+        assert shape._tolerance == expected._tolerance
+        assert np.isclose(shape.poly.area(), expected.poly.area())
+    assert loaded[3].colors == {'primary': (1, 2, 3), 'other': (7, 8, 9)}
+    assert loaded[-1]._contours[1] == shapes[-1]._contours[1]
+    assert isinstance(loaded[0]._points.base.base, np.memmap)
+
+    # Changes are not written to the file.
+    loaded[0].translate([1, 1])
+    loaded[0].velocity = [3, 4]
+    assert Shape.load_scene(str(path)) == shapes
+
+    with open(path, 'rb') as file:
+        assert Shape.load_scene(io.BytesIO(file.read())) == shapes
+    stream = io.BytesIO()
+    Shape.save_scene(stream, [])
+    stream.seek(0)
+    assert Shape.load_scene(stream) == []
+    with pytest.raises(ValueError):
+        Shape.load_scene(io.BytesIO(b'not a scene file at all'))
+
+
 def test_colors():
     colors = {
         'primary': (0, 0, 0),
@@ -107,6 +230,20 @@ def test_color():
     assert shape.color == (10, 20, 30)
 
 
+def test_shared_palette():
+    shape = Shape.circle([0, 0], 1, color=[1, 2, 3])
+    other = Shape.circle([1, 0], 1, color=(1, 2, 3))
+    assert shape.colors is other.colors
+    assert not hasattr(shape, '__dict__')
+    with pytest.raises(TypeError):
+        shape.colors['primary'] = (4, 5, 6)
+
+    shape.color = (4, 5, 6)
+    assert shape.color == (4, 5, 6)
+    assert other.color == (1, 2, 3)
+    assert eval(repr(shape)) == shape
+
+
 def test_update():
     shape = Shape.circle([0, 0], 1, velocity=[1, 1])
     shape.update(1)
@@ -117,6 +254,70 @@ def test_update():
     assert shape == Shape.regular_polygon([-1, 1], 1, 6, angular_velocity=1, velocity=[-2, 2], start_angle=0.5)
 
 
+def test_collide():
+    a = Shape.rectangle([[0, 0], [10, 10]])
+    b = Shape.rectangle([[8, 2], [20, 6]])
+    depth, normal, points = a.collide(b)
+    assert np.isclose(depth, 2)
+    assert np.all(np.isclose(normal, [1, 0]))
+    assert np.all(np.isclose(np.sort(points, axis=0), [[8, 2], [8, 6]]))
+    depth, normal, points = b.collide(a)
+    assert np.isclose(depth, 2)
+    assert np.all(np.isclose(normal, [-1, 0]))
+    assert not b.translate(-1.001 * depth * normal).overlaps(a)
+
+    assert a.collide(Shape.rectangle([[11, 0], [12, 1]])) is None
+    assert a.collide(Shape.rectangle([[10.5, 0], [12, 12]]).rotate(0.1)) is None
+
+    circle, other = Shape.circle([0, 0], 5), Shape.circle([8, 1], 5).rotate(0.3)
+    depth, normal, points = circle.collide(other)
+    assert 0 < depth < 2
+    assert np.all(np.isclose(normal, [8, 1] / np.hypot(8, 1), atol=0.05))
+    assert np.all(circle.contains_points(points - 1e-6 * normal))
+    other.translate(1.001 * depth * normal)
+    assert not circle.overlaps(other)
+
+    star = Shape([[0, 10], [2, 2], [10, 0], [2, -2], [0, -10], [-2, -2], [-10, 0], [-2, 2]])
+    depth, normal, points = star.collide(Shape.circle([9, 0], 2))
+    assert not star._convex
+    assert np.all(np.isclose(normal, [1, 0]))
+    assert 2 < depth < 4
+    assert np.all(star.contains_points(points))
+    assert star.collide(Shape.circle([9, 5], 1)) is None
+
+
+def test_time_of_impact():
+    wall = Shape.rectangle([[-1, -100], [1, 100]])
+    bullet = Shape.rectangle([[-55, -5], [-45, 5]], velocity=[1000, 0])
+    assert np.isclose(bullet.time_of_impact(wall, 0.1), 0.044, atol=1e-5)
+    assert np.isclose(wall.time_of_impact(bullet, 0.1), 0.044, atol=1e-5)
+    assert bullet.time_of_impact(wall, 0.04) is None
+    bullet.update(0.1)
+    assert not bullet.overlaps(wall)
+
+    assert Shape.rectangle([[-55, -5], [-45, 5]], velocity=[0, 1000]).time_of_impact(wall, 0.1) is None
+    assert Shape.circle([0, 0], 5).time_of_impact(wall, 0.1) == 0
+
+    bar = Shape.rectangle([[-10, -1], [10, 1]], angular_velocity=np.pi / 2)
+    block = Shape.rectangle([[-1, 7], [1, 9]])
+    time = bar.time_of_impact(block, 1)
+    assert 0 < time < 1
+    bar.update(time - 0.01)
+    assert not bar.overlaps(block)
+    bar.update(0.02)
+    assert bar.overlaps(block)
+
+
+def test_time_to_boundary():
+    shape = Shape.rectangle([[-5, -5], [5, 5]], velocity=[100, 0])
+    assert np.isclose(shape.time_to_boundary([[-100, -100], [100, 100]], 1), 0.95, atol=1e-4)
+    assert shape.time_to_boundary([[-100, -100], [100, 100]], 0.5) is None
+    assert shape.time_to_boundary([[0, -100], [100, 100]], 1) == 0
+    spinning = Shape.rectangle([[-5, -1], [5, 1]], angular_velocity=np.pi)
+    assert np.isclose(spinning.time_to_boundary([[-100, -3], [100, 3]], 1),
+                      (np.arcsin(3 / np.hypot(5, 1)) - np.arctan(1 / 5)) / np.pi, atol=1e-3)
+
+
 def test_repr():
     shape = Shape.circle([0, 0], 1, velocity=[1, 1], color=(1, 2, 3), colors={'a': (20, 6, 169)})
     assert eval(repr(shape)) == shape
@@ -174,6 +375,34 @@ def test_flip():
     assert shape == Shape.rectangle([[-3, 1], [-1, 3]])
 
 
+def test_transform():
+    shape = Shape.regular_polygon([1, 1], 1, 5, start_angle=0.3)
+    expected = shape.copy().flip_x().scale(2).rotate(np.pi / 3).translate([2, -1])
+    assert shape.transform(angle=np.pi / 3, factor=[-2, 2], offset=[2, -1]) is shape
+    assert np.all(np.isclose(shape.vertices, expected.vertices))
+
+    shape.transform([[0, -1], [1, 0]], center=[0, 0])
+    expected.rotate(np.pi / 2, center=[0, 0])
+    assert np.all(np.isclose(shape.vertices, expected.vertices))
+    assert np.all(np.isclose(shape.bounds, expected.bounds))
+
+
+def test_copy():
+    shape = Shape.regular_polygon([1, 1], 1, 5, velocity=[1, 2], angular_velocity=3, color=(1, 2, 3))
+    center = shape.center
+    copy = shape.copy()
+    assert copy == shape
+    assert copy.angular_velocity == 3
+    assert copy._triangle_indices is shape._triangle_indices
+    assert not pyglet.graphics.vertex_list_indexed.called
+
+    copy.translate([1, 0])
+    copy.velocity = [0, 0]
+    assert np.all(shape.center == center)
+    assert np.all(shape.velocity == [1, 2])
+    assert np.all(np.isclose(copy.center, center + [1, 0]))
+
+
 def test_from_polygon():
     shape = Shape.circle([0, 0], 1)
     assert shape == Shape(shape.poly)
@@ -245,6 +474,95 @@ def test_xor():
             (Shape.rectangle([[-1, 0], [1, 1]])) - Shape.rectangle([[-0.5, 0], [0.5, 1]]))
 
 
+def test_boolean_cache(monkeypatch):
+    cache = BooleanCache(maxsize=2)
+    monkeypatch.setattr(Shape, 'boolean_cache', cache)
+    a = Shape.circle([0, 0], 10, color=(1, 2, 3))
+    b = Shape.rectangle([[0, 0], [20, 5]])
+    first = a - b
+    second = a - b
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert second == first and second is not first
+    assert second._triangle_indices is first._triangle_indices
+    assert np.isclose((a.poly - b.poly).area(), second.poly.area())
+
+    a.color = (4, 5, 6)
+    b.velocity = [1, 1]
+    assert (a & b).color == (4, 5, 6)
+    assert (a & b) == Shape(a.poly & b.poly, color=(4, 5, 6))
+    assert (cache.hits, cache.misses) == (2, 2)
+
+    first.translate([1, 0])
+    assert np.all(np.isclose((a - b).center, second.center))
+    b.translate([1, 0])
+    assert a - b == Shape(a.poly - b.poly)
+    assert (cache.hits, cache.misses) == (3, 3)
+    assert len(cache) == 2
+
+    a | b, a ^ b
+    assert len(cache) == 2
+    cache.clear()
+    assert (len(cache), cache.hits, cache.misses) == (0, 0, 0)
+
+
+def test_frame_stats(monkeypatch):
+    frames = []
+    stats = FrameStats(on_frame=lambda stats: frames.append((dict(stats.counts), dict(stats.times))),
+                       clock=iter(range(1000)).__next__)
+    monkeypatch.setattr(Shape, 'stats', stats)
+    shape = Shape.rectangle([[0, 0], [2, 2]], angular_velocity=0.1)
+    other = Shape.circle([1, 1], 1, n_vertices=8)
+    shape.draw()
+    shape.update(1)
+    shape.scale(2)
+    shape.draw()
+    shape.overlaps(other)
+    shape.collide(other)
+    shape & other
+    MotionSystem([shape, other]).update(1)
+    stats.end_frame()
+
+    counts, times = frames[0]
+    assert counts == {'draw': 2, 'upload': 1, 'vertex_building': 1, 'uploaded_vertices': 5, 'transform': 5,
+                      'collision': 2, 'boolean': 1}
+    assert times['draw'] > times['upload'] > times['vertex_building'] > 0
+    assert stats.frames == 1
+    assert stats.total_counts['transform'] == 5
+    assert not stats.counts
+
+    ShapeBatch([other]).draw()
+    stats.end_frame()
+    assert frames[1][0] == {'draw': 1, 'upload': 1, 'vertex_building': 1, 'uploaded_vertices': 9}
+    assert stats.total_counts['draw'] == 3
+
+    shape.flip_x()
+    shape.flip_y([0, 0])
+    Shape.difference_all(shape, [other], processes=1)
+    stats.end_frame()
+    assert frames[2][0] == {'transform': 2, 'boolean': 1}
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_union_all(processes):
+    shapes = random_shapes(30)
+    expected = shapes[0]
+    for shape in shapes[1:]:
+        expected = expected | shape
+    union = Shape.union_all(shapes, processes=processes, color=(1, 2, 3))
+    assert union.color == (1, 2, 3)
+    assert np.isclose(union.poly.area(), expected.poly.area())
+    assert np.isclose((union.poly ^ expected.poly).area(), 0, atol=1e-6)
+
+    base = Shape.rectangle([[-50, -50], [50, 50]])
+    expected = base
+    for shape in shapes:
+        expected = expected - shape
+    difference = Shape.difference_all(base, shapes, processes=processes)
+    assert np.isclose(difference.poly.area(), expected.poly.area())
+    assert np.isclose((difference.poly ^ expected.poly).area(), 0, atol=1e-6)
+    assert not len(Shape.union_all([]))
+
+
 def test_center():
     shape = Shape.rectangle([[-1, -1], [1, 1]])
     assert np.all(np.isclose(shape.center, [0, 0]))
@@ -264,6 +582,20 @@ def test_distance_to():
     assert np.isclose(shape.distance_to([1, 1]), np.sqrt(2))
 
 
+def test_distance_to_points():
+    shape = Shape.circle([1, 1], 1)
+    points = [[0, 0], [4, 5], [1, 1]]
+    assert np.all(np.isclose(shape.distance_to_points(points), [shape.distance_to(point) for point in points]))
+
+
+def test_contains_points():
+    shape = Shape.circle([0, 0], 10) - Shape.rectangle([[-2, -2], [2, 2]]) - Shape.circle([6, 0], 2)
+    points = np.random.RandomState(0).uniform(-12, 12, (2000, 2))
+    assert np.all(shape.contains_points(points) == [shape.poly.isInside(*point) for point in points])
+    assert shape.contains_points([[-5, 0]]).tolist() == [True]
+    assert shape.contains_points(np.empty((0, 2))).shape == (0,)
+
+
 def test_eq():
     assert Shape.regular_polygon([0, 0], 1, 4) != Shape.regular_polygon([0, 0], 1, 5)
     assert Shape.regular_polygon([0, 0], 1, 4) == Shape.regular_polygon([0, 0], 1, 4, start_angle=np.pi)
@@ -297,7 +629,7 @@ def test_vertex_list():
     args = shape._vertex_list.args
     assert len(args) == 4
     assert args[0] == 5
-    assert args[1] == indices
+    assert list(args[1]) == indices
     assert args[2][0] == 'v2f'
     assert np.all(np.isclose(args[2][1], vertices))
     assert args[3][0] == 'c3B'
@@ -317,3 +649,584 @@ def test_enable_disable():
     gl_triangles = call_args[0][0]
     assert isinstance(gl_triangles, Mock)
 
+
+def test_draw_uploads_only_changes():
+    shape = Shape.rectangle([[-1, -1], [1, 1]], color=(100, 100, 100))
+    shape.draw()
+    shape._vertex_list.vertices = None
+    shape._vertex_list.colors = None
+    shape.draw()
+    assert shape._vertex_list.vertices is None
+    assert shape._vertex_list.colors is None
+
+    shape.translate([1, 1])
+    shape._geometry_changed()
+    shape.draw()
+    assert np.all(np.isclose(shape._vertex_list.vertices, [1, 1, 0, 0, 2, 0, 2, 2, 0, 2]))
+    assert shape._vertex_list.colors is None
+
+    shape.color = (1, 2, 3)
+    shape.draw()
+    assert shape._vertex_list.colors == 5 * (1, 2, 3)
+    assert not pyglet.gl.glMultMatrixf.called
+
+
+def test_draw_with_model_matrix():
+    shape = Shape.rectangle([[0, 0], [2, 2]])
+    shape.draw()
+    shape._vertex_list.vertices = None
+    shape.translate([1, 0]).rotate(np.pi / 2, center=[0, 0]).scale(2, center=[0, 0])
+    shape.draw()
+    assert shape._vertex_list.vertices is None
+    assert pyglet.gl.glPushMatrix.call_count == pyglet.gl.glPopMatrix.call_count == 1
+    matrix = np.reshape(list(pyglet.gl.glMultMatrixf.call_args[0][0]), (4, 4)).T
+    uploaded = np.reshape(shape._vertex_list.args[2][1], (-1, 2))
+    assert np.all(np.isclose(uploaded[1:].dot(matrix[:2, :2].T) + matrix[:2, 3], shape.vertices))
+
+    batch = ShapeBatch([shape])
+    shape.translate([1, 0])
+    batch.draw()
+    assert np.all(np.isclose(np.reshape(shape._vertex_list.vertices, (-1, 2))[1:], shape.vertices))
+    assert pyglet.gl.glMultMatrixf.call_count == 1
+
+
+def test_vertex_list_created_on_draw():
+    shape = Shape.rectangle([[-1, -1], [1, 1]])
+    shape.translate([1, 1])
+    assert not pyglet.graphics.vertex_list_indexed.called
+    shape.draw()
+    assert pyglet.graphics.vertex_list_indexed.call_count == 1
+    assert shape._vertex_list.args[2][1] == shape._gl_vertices
+
+
+def test_import_does_not_import_pyglet():
+    code = 'import sys, pyglet2d; pyglet2d.Shape.circle([0, 0], 1) | pyglet2d.Shape.circle([1, 0], 1); ' \
+           'assert "pyglet" not in sys.modules'
+    subprocess.run([sys.executable, '-c', code], check=True, env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)))
+
+
+def test_in_place_operations_mark_dirty():
+    shape = Shape.rectangle([[-1, -1], [1, 1]])
+    for operation in [lambda s: s.rotate(1), lambda s: s.scale(2), lambda s: s.flip_x(), lambda s: s.flip_y(),
+                      lambda s: s.__iadd__([1, 0]), lambda s: s.__isub__([1, 0]),
+                      lambda s: s.__imul__(2), lambda s: s.__itruediv__(2)]:
+        version = shape._geometry_version
+        assert operation(shape) is shape
+        assert shape._geometry_version != version
+
+
+def test_vertices_read_only():
+    shape = Shape.circle([0, 0], 1)
+    with pytest.raises(ValueError):
+        shape.vertices[0] = [5, 5]
+
+
+def test_poly_cached():
+    shape = Shape.rectangle([[-1, -1], [1, 1]])
+    assert shape._get_poly() is shape._get_poly()
+    poly = shape._get_poly()
+    shape.translate([1, 0])
+    assert shape._get_poly() is not poly
+    assert np.all(np.isclose(shape.poly.center(), [1, 0]))
+
+
+def test_poly_is_a_copy():
+    shape = Shape.rectangle([[0, 0], [1, 1]])
+    other = Shape.rectangle([[5, 5], [6, 6]])
+    shape.poly.shift(5, 5)
+    assert not shape.overlaps(other)
+    poly = Polygon(((0, 0), (1, 0), (1, 1)))
+    shape = Shape(poly)
+    poly.shift(5, 5)
+    assert not shape.overlaps(other)
+    assert np.all(np.isclose(shape.bounds, [[0, 0], [1, 1]]))
+
+
+def test_velocity_view():
+    shape = Shape.rectangle([[0, 0], [1, 1]], velocity=[1, 2])
+    velocity = shape.velocity
+    kept = shape.velocity.copy()
+    shape.velocity = [3, 4]
+    assert np.all(velocity == [3, 4])
+    assert np.all(kept == [1, 2])
+
+
+def test_vertices_view():
+    shape = Shape.rectangle([[0, 0], [1, 1]])
+    vertices = shape.vertices
+    kept = shape.vertices.copy()
+    shape.translate([1, 2])
+    assert np.all(vertices == kept + [1, 2])
+    with pytest.raises(ValueError):
+        vertices[0] = 0
+
+
+def test_empty_shape():
+    a = Shape.rectangle([[0, 0], [1, 1]])
+    b = Shape.rectangle([[5, 5], [6, 6]], velocity=[-10, -10])
+    empty = a & b
+    assert len(empty) == 0
+    assert np.all(empty.bounds == [[np.inf, np.inf], [-np.inf, -np.inf]])
+    assert empty.bounding_circle[1] == 0
+    assert empty.collide(a) is None and a.collide(empty) is None
+    assert empty.time_of_impact(b, 1) is None
+    assert empty.time_to_boundary([[0, 0], [10, 10]], 1) is None
+    empty.draw(viewport=[[0, 0], [1, 1]])
+    assert not pyglet.graphics.vertex_list_indexed.called
+    empty.copy().translate([1, 1]).rotate(1).scale(-2)
+
+    index = SpatialIndex(1, [empty, a, b])
+    assert index.query_overlaps(Shape.rectangle([[0, 0], [2, 2]])) == [a]
+    assert index.all_contacts() == []
+    assert [(t, x, y) for t, x, y in index.all_impacts(1) if empty in (x, y)] == []
+    assert index.query_nearest([[0, 0]])[0].tolist() == [1]
+    assert Shape.union_all([empty, a]) == a
+
+
+def test_holes():
+    shape = Shape.rectangle([[0, 0], [4, 4]]) - Shape.rectangle([[1, 1], [2, 2]])
+    assert len(shape) == 8
+    assert np.all(np.isclose(shape.center, shape.poly.center()))
+    assert sorted(shape.poly.isHole(i) for i in range(len(shape.poly))) == [False, True]
+    shape.rotate(1)
+    assert np.all(np.isclose(shape.center, shape.poly.center()))
+    assert np.isclose(shape.poly.area(), 15)
+
+
+def test_float32_dtype():
+    class CompactShape(Shape):
+        dtype = np.float32
+
+    shape = CompactShape.circle([0, 0], 1)
+    assert shape.vertices.dtype == np.float32
+    shape.scale(2).rotate(1).translate([1, 1]).flip_x()
+    assert shape == Shape.circle([0, 0], 2).rotate(1).translate([1, 1]).flip_x()
+    assert isinstance(shape & Shape.circle([0, 0], 1), CompactShape)
+
+
+def test_shape_batch():
+    shapes = [Shape.circle([0, 0], 1), Shape.rectangle([[-1, -1], [1, 1]], color=(1, 2, 3))]
+    standalone_vertex_lists = [shape._vertex_list for shape in shapes]
+    batch = ShapeBatch(shapes)
+    assert len(batch) == 2
+    assert list(batch) == shapes
+    assert shapes[0] in batch
+    for shape, vertex_list in zip(shapes, standalone_vertex_lists):
+        assert vertex_list.delete.called
+        assert shape._vertex_list.args[0] == len(shape) + 1
+        assert shape._vertex_list.args[2] is None
+        assert shape._vertex_list.args[3] == shape._triangle_indices
+    assert batch.batch.add_indexed.call_count == 2
+
+    batch.draw()
+    assert batch.batch.draw.call_count == 1
+    assert not shapes[0]._vertex_list.draw.called
+
+    batch.remove(shapes[0])
+    assert shapes[0] not in batch
+    assert len(batch) == 1
+    assert shapes[0]._vertex_list.args[1] == shapes[0]._triangle_indices
+
+
+def test_shape_batch_sync():
+    shape = Shape.rectangle([[-1, -1], [1, 1]])
+    batch = ShapeBatch([shape])
+    shape._vertex_list.vertices = None
+    batch.draw()
+    assert shape._vertex_list.vertices is None
+    shape.translate([1, 1])
+    batch.draw()
+    assert np.all(np.isclose(shape._vertex_list.vertices, [1, 1, 0, 0, 2, 0, 2, 2, 0, 2]))
+
+    shape.enable(False)
+    batch.draw()
+    assert shape._vertex_list.indices == 12 * (0,)
+    shape.enable(True)
+    shape._vertex_list.start = 10
+    batch.draw()
+    assert shape._vertex_list.indices == [index + 10 for index in shape._triangle_indices]
+
+
+def test_draw_viewport():
+    viewport = [[0, 0], [10, 10]]
+    inside, outside = Shape.rectangle([[-1, -1], [1, 1]]), Shape.rectangle([[11, 0], [12, 1]])
+    inside.draw(viewport)
+    outside.draw(viewport)
+    assert pyglet.graphics.vertex_list_indexed.call_count == 1
+    assert inside._vertex_list.draw.call_count == 1
+
+    outside.translate([-5, 0])
+    shape = Shape.circle([20, 20], 1)
+    batch = ShapeBatch([outside, shape])
+    shape.translate([1, 1])
+    shape._vertex_list.vertices = None
+    batch.draw(viewport)
+    assert shape._vertex_list.indices == len(shape._triangle_indices) * (0,)
+    assert shape._vertex_list.vertices is None
+    assert outside._vertex_list.indices != len(outside._triangle_indices) * (0,)
+    shape.translate([-15, -15])
+    batch.draw(viewport)
+    assert shape._vertex_list.indices == list(shape._triangle_indices)
+    assert shape._vertex_list.vertices is not None
+
+    # A culled circle that changes its number of vertices stays hidden.
+    circle = Shape.circle([100, 100], 1, tolerance=0.5)
+    batch.add(circle)
+    batch.draw(viewport)
+    circle.scale(50)
+    assert circle._vertex_list.indices != len(circle._triangle_indices) * (0,)
+    batch.draw(viewport)
+    assert circle._vertex_list.indices == len(circle._triangle_indices) * (0,)
+
+
+def random_shapes(n):
+    shapes = []
+    for i in range(n):
+        center = np.random.uniform(-100, 100, 2)
+        velocity = np.random.uniform(-10, 10, 2)
+        angular_velocity = np.random.normal()
+        if i % 2:
+            shapes.append(Shape.regular_polygon(center, np.random.uniform(1, 10), 3 + i % 10,
+                                                velocity=velocity, angular_velocity=angular_velocity))
+        else:
+            shapes.append(Shape.rectangle([center, center + np.random.uniform(1, 10, 2)],
+                                          velocity=velocity, angular_velocity=angular_velocity))
+    return shapes
+
+
+def test_motion_system_update():
+    shapes = random_shapes(20)
+    expected = [Shape(shape.vertices, **shape._kwargs) for shape in shapes]
+    for shape, copy in zip(shapes, expected):
+        copy.angular_velocity = shape.angular_velocity
+
+    system = MotionSystem(shapes)
+    for dt in [0.1, 0.02, 0.5]:
+        versions = [shape._geometry_version for shape in shapes]
+        system.update(dt)
+        for copy in expected:
+            copy.update(dt)
+        for shape, copy, version in zip(shapes, expected, versions):
+            assert np.all(np.isclose(shape.vertices, copy.vertices))
+            assert shape._geometry_version != version
+
+
+def test_motion_system_shares_state():
+    shapes = random_shapes(3)
+    system = MotionSystem(shapes[:2])
+    shapes[0].velocity = [1, 2]
+    assert np.all(system.velocities[0] == [1, 2])
+    system.angular_velocities[1] = 3
+    assert shapes[1].angular_velocity == 3
+
+    system.add(shapes[2])
+    assert len(system) == 3
+    shapes[2].translate([1, 1])
+    assert np.all(system._points[system._offsets[2]:system._offsets[3]] == shapes[2].vertices)
+
+    system.remove(shapes[0])
+    assert shapes[0] not in system
+    assert list(system) == shapes[1:]
+    vertices = shapes[0].vertices.copy()
+    system.update(1)
+    assert np.all(shapes[0].vertices == vertices)
+    assert np.all(system.velocities[0] == shapes[1].velocity)
+
+
+@pytest.mark.parametrize('use_system', [False, True])
+def test_simulation(use_system):
+    shapes = random_shapes(5)
+    expected = [shape.copy() for shape in shapes]
+    steps = []
+    simulation = Simulation(MotionSystem(shapes) if use_system else shapes, timestep=0.1, max_steps=3,
+                            on_step=steps.append)
+    assert simulation.update(0.05) == 0
+    assert simulation.update(0.07) == 1
+    assert np.isclose(simulation.alpha, 0.2)
+    # Too much time for max_steps: the extra time is dropped.
+    assert simulation.update(1) == 3
+    assert simulation.alpha == 0
+    assert steps == [0.1] * 4
+    assert np.isclose(simulation.time, 0.4)
+    for _ in range(4):
+        previous = expected[-1].copy()
+        for shape in expected:
+            shape.update(0.1)
+    for shape, copy in zip(shapes, expected):
+        assert np.all(np.isclose(shape.vertices, copy.vertices))
+
+    # Shapes are drawn between their last two steps.
+    simulation.update(0.025)
+    simulation.draw()
+    assert pyglet.gl.glPushMatrix.call_count == len(shapes)
+    matrix = np.reshape(list(pyglet.gl.glMultMatrixf.call_args[0][0]), (4, 4)).T
+    previous.update(0.025)
+    drawn = shapes[-1].vertices.dot(matrix[:2, :2].T) + matrix[:2, 3]
+    assert np.all(np.isclose(drawn, previous.vertices, atol=1e-4))
+
+
+def test_motion_system_remove_many():
+    shapes = random_shapes(10)
+    system = MotionSystem(shapes)
+    removed = shapes[1::3]
+    vertices = [shape.vertices.copy() for shape in removed]
+    system.remove_many(removed)
+    kept = [shape for shape in shapes if not any(shape is other for other in removed)]
+    assert list(system) == kept
+    assert all(shape not in system for shape in removed)
+    for shape, expected in zip(removed, vertices):
+        assert np.all(shape.vertices == expected)
+        assert not np.shares_memory(shape._points, system._points)
+
+    expected = [shape.copy() for shape in kept]
+    for shape, copy in zip(kept, expected):
+        copy.angular_velocity = shape.angular_velocity
+    system.update(0.5)
+    for shape, copy in zip(kept, expected):
+        copy.update(0.5)
+        assert np.all(np.isclose(shape.vertices, copy.vertices))
+        assert np.shares_memory(shape._points, system._points)
+    system.remove_many(kept)
+    assert len(system) == 0
+
+
+def test_spatial_index_queries():
+    shapes = random_shapes(40)
+    index = SpatialIndex(20, shapes)
+    assert len(index) == 40
+    assert list(index) == shapes
+
+    expected_pairs = [(a, b) for i, a in enumerate(shapes) for b in shapes[i + 1:] if a.overlaps(b)]
+    assert index.all_overlapping_pairs() == expected_pairs
+
+    probe = Shape.circle([10, -10], 30)
+    assert index.query_overlaps(probe) == [shape for shape in shapes if probe.overlaps(shape)]
+    rectangle = Shape.rectangle([[-50, -20], [0, 30]])
+    assert index.query_rectangle([[-50, -20], [0, 30]]) == [shape for shape in shapes if rectangle.overlaps(shape)]
+    point = shapes[7].center
+    assert shapes[7] in index.query_point(point)
+    assert index.query_point(point) == [shape for shape in shapes if shape.poly.isInside(*point)]
+
+
+def test_spatial_index_point_arrays():
+    shapes = random_shapes(20)
+    index = SpatialIndex(20, shapes)
+    points = np.random.RandomState(1).uniform(-60, 60, (300, 2))
+    contained = index.query_points(points)
+    assert contained.shape == (300, 20)
+    assert np.all(contained == [[shape.poly.isInside(*point) for shape in shapes] for point in points])
+    # Points spread over many small cells, and a point that is not finite.
+    fine = SpatialIndex(2, shapes)
+    assert np.all(fine.query_points(points) == contained)
+    assert not np.any(fine.query_points([[np.nan, 0]]))
+    assert fine.query_rectangle([[-1e6, -1e6], [1e6, 1e6]]) == shapes
+
+    indices, distances = index.query_nearest(points)
+    all_distances = np.array([shape.distance_to_points(points) for shape in shapes]).T
+    assert np.all(indices == np.argmin(all_distances, axis=1))
+    assert np.all(np.isclose(distances, np.min(all_distances, axis=1)))
+
+
+def test_spatial_index_impacts():
+    wall = Shape.rectangle([[-1, -100], [1, 100]])
+    fast = Shape.rectangle([[-55, -5], [-45, 5]], velocity=[1000, 0])
+    slow = Shape.rectangle([[-55, 50], [-45, 60]], velocity=[10, 0])
+    chasing = Shape.rectangle([[-95, -5], [-85, 5]], velocity=[1500, 0])
+    index = SpatialIndex(20, [fast, wall, slow, chasing])
+    impacts = index.all_impacts(0.1)
+    assert [(a, b) for _, a, b in impacts] == [(fast, wall), (wall, chasing), (fast, chasing)]
+    assert np.isclose(impacts[0][0], 0.044, atol=1e-5)
+    assert np.isclose(impacts[1][0], 0.084 / 1.5, atol=1e-5)
+    assert np.isclose(impacts[2][0], 0.06, atol=1e-5)
+    assert all(entry[1] == shape._geometry_version for entry, shape in zip(index._entries.values(), index))
+
+
+def test_spatial_index_draw():
+    shapes = [Shape.circle([x, 0], 1) for x in range(0, 1000, 10)]
+    index = SpatialIndex(20, shapes)
+    index.draw([[-5, -5], [25, 5]])
+    assert [shape._allocated_vertex_list is not None for shape in shapes[:5]] == [True] * 3 + [False] * 2
+    assert pyglet.graphics.vertex_list_indexed.call_count == 3
+    shapes[-1].translate([-980, 0])
+    index.update()
+    index.draw([[-5, -5], [25, 5]])
+    assert shapes[-1]._vertex_list.draw.call_count == 1
+
+
+def test_spatial_index_contacts():
+    shapes = random_shapes(40)
+    index = SpatialIndex(20, shapes)
+    contacts = index.all_contacts()
+    assert [(a, b) for a, b, _ in contacts] == index.all_overlapping_pairs()
+    for a, b, (depth, normal, points) in contacts:
+        assert depth >= 0
+        assert np.isclose(np.hypot(*normal), 1)
+
+
+def test_spatial_index_update():
+    a = Shape.circle([0, 0], 1)
+    b = Shape.circle([100, 100], 1)
+    index = SpatialIndex(10, [a, b])
+    assert index.all_overlapping_pairs() == []
+
+    b.center = [1, 0]
+    assert index.all_overlapping_pairs() == []
+    index.update()
+    assert index.all_overlapping_pairs() == [(a, b)]
+    assert index.query_overlaps(a) == [b]
+
+    index.remove(a)
+    assert a not in index
+    assert index.query_point([1, 0]) == [b]
+    assert index.query_overlaps(a) == [b]
+    assert all(cell for cell in index._cells.values())
+
+
+def test_bounds():
+    shape = Shape.rectangle([[-1, -2], [3, 4]])
+    assert np.all(shape.bounds == [[-1, -2], [3, 4]])
+    assert shape.bounds is shape.bounds
+    with pytest.raises(ValueError):
+        shape.bounds[0, 0] = 5
+    center, radius = shape.bounding_circle
+    assert np.all(np.isclose(center, [1, 1]))
+    assert np.isclose(radius, np.sqrt(13))
+
+
+def test_cached_geometry_follows_transformations():
+    shape = Shape.regular_polygon([1, 2], 3, 7, start_angle=0.3)
+    for operation in [lambda s: s.translate([5, -1]), lambda s: s.scale(2), lambda s: s.scale([-1, 3], center=[1, 1]),
+                      lambda s: s.rotate(0.7), lambda s: s.flip_x(), lambda s: s.flip_y([0, 3]), lambda s: s.flip(1),
+                      lambda s: s.__imul__(0.5), lambda s: s.update(0.1)]:
+        shape.bounds, shape.bounding_circle
+        operation(shape)
+        fresh = Shape(shape.vertices)
+        assert np.all(np.isclose(shape.bounds, fresh.bounds))
+        assert np.all(np.isclose(shape.center, fresh.center))
+        assert np.isclose(shape.bounding_circle[1], fresh.bounding_circle[1])
+
+
+def test_translation_keeps_cache():
+    shape = Shape.rectangle([[-1, -1], [1, 1]])
+    shape.bounds
+    shape.translate([1, 0])
+    # The cached bounds are only updated when read.
+    assert shape._pending_matrix is not None
+    assert np.all(np.isclose(shape.bounds, [[0, -1], [2, 1]]))
+    assert shape._cache_version == shape._geometry_version
+
+    shape.center
+    shape.transform(angle=np.pi / 2, center=[0, 0]).translate([3, 1]).scale([2, 1]).flip_x()
+    shape.translate([-1, 2])
+    fresh = Shape(shape.vertices)
+    assert np.allclose(shape.center, fresh.center)
+    assert np.allclose(shape.bounds, fresh.bounds)
+
+
+def test_triangle_indices_shared():
+    a = Shape.circle([0, 0], 1)
+    b = Shape.circle([5, 5], 2)
+    assert a._triangle_indices is b._triangle_indices
+    assert isinstance(a._triangle_indices, tuple)
+    assert a._triangle_indices[-3:] == (0, 50, 1)
+    assert Shape.regular_polygon([0, 0], 1, 3)._triangle_indices == (0, 1, 2, 0, 2, 3, 0, 3, 1)
+
+
+def triangles_area(shape):
+    points = np.reshape(shape._gl_vertices, (-1, 2))
+    a, b, c = (points[list(shape._triangle_indices[i::3])] for i in range(3))
+    ab, ac = b - a, c - a
+    return np.sum(np.abs(ab[:, 0] * ac[:, 1] - ab[:, 1] * ac[:, 0])) / 2
+
+
+def test_triangulation_convex():
+    for shape in [Shape.circle([0, 0], 1), Shape.rectangle([[0, 0], [1, 2]]), Shape.regular_polygon([0, 0], 1, 3)]:
+        assert shape._triangle_indices is shape._triangle_indices
+        assert shape._triangle_indices[:3] == (0, 1, 2)
+
+
+def test_triangulation_concave():
+    shape = Shape([[0, 0], [2, 0], [2, 2], [1, 2], [1, 1], [0, 1]])
+    assert 0 not in shape._triangle_indices
+    assert np.isclose(triangles_area(shape), 3)
+    star = Shape.regular_polygon([0, 0], 1, 5)
+    star = Shape(star.vertices[[0, 2, 4, 1, 3]])
+    assert star._triangle_indices[:3] != (0, 1, 2)
+
+    shape.rotate(1).scale([2, 1])
+    indices = shape._triangle_indices
+    assert np.isclose(triangles_area(shape), 6)
+    assert shape._triangle_indices is indices
+
+
+def test_triangulation_holes():
+    shape = Shape.rectangle([[0, 0], [4, 4]]) - Shape.rectangle([[1, 1], [2, 2]])
+    assert np.isclose(triangles_area(shape), 15)
+    assert shape._vertex_list.args[0] == shape._vertex_count > len(shape) + 1
+    assert list(shape._vertex_list.args[1]) == list(shape._triangle_indices)
+    assert len(shape._vertex_list.args[2][1]) == 2 * shape._vertex_count
+    assert len(shape._vertex_list.args[3][1]) == 3 * shape._vertex_count
+
+    shape.rotate(0.5, center=[0, 0]).scale([1, 3])
+    assert np.isclose(triangles_area(shape), 45)
+
+
+def test_triangulation_boolean_operations():
+    a = Shape.regular_polygon([0, 0], 1, 7)
+    b = Shape.regular_polygon([0.7, 0.3], 0.8, 9)
+    for shape in [a - b, a ^ b, b - a, (a | b) - Shape.circle([0.2, 0.1], 0.3)]:
+        assert np.isclose(triangles_area(shape), shape.poly.area())
+        shape.rotate(2).translate([3, 1])
+        assert np.isclose(triangles_area(shape), shape.poly.area())
+
+
+def test_instanced_shape():
+    template = Shape.regular_polygon([5, 5], 1, 6, color=(10, 20, 30))
+    instances = InstancedShape(template, [[0, 0], [10, 0]], angles=[0, np.pi / 2], scales=[1, 2])
+    assert len(instances) == 2
+    args = instances._vertex_list.args
+    assert len(args) == 3
+    assert args[0] == 7
+    assert np.all(np.isclose(np.reshape(args[2][1], (-1, 2))[0], [0, 0]))
+    assert np.all(instances.colors == (10, 20, 30))
+
+    instances.append([0, 10], color=(1, 2, 3))
+    assert len(instances) == 3
+    assert instances[2] == Shape.regular_polygon([0, 10], 1, 6, color=(1, 2, 3))
+    assert instances[1] == Shape.regular_polygon([10, 0], 2, 6, start_angle=np.pi / 2, color=(10, 20, 30))
+    instances.positions[0] = [3, 4]
+    assert instances[0] == Shape.regular_polygon([3, 4], 1, 6, color=(10, 20, 30))
+
+    instances.draw()
+    assert instances._vertex_list.draw.call_count == 3
+    assert pyglet.gl.glPushMatrix.call_count == pyglet.gl.glPopMatrix.call_count == 3
+    pyglet.gl.glTranslatef.assert_any_call(10, 0, 0)
+    pyglet.gl.glRotatef.assert_any_call(90, 0, 0, 1)
+    pyglet.gl.glScalef.assert_any_call(2, 2, 1)
+    pyglet.gl.glColor3ub.assert_any_call(1, 2, 3)
+
+    instances.draw(viewport=[[8, -1], [20, 1]])
+    assert instances._vertex_list.draw.call_count == 4
+    pyglet.gl.glTranslatef.assert_called_with(10, 0, 0)
+
+    instances.remove(0)
+    assert len(instances) == 2
+    instances.enable(False).draw()
+    assert instances._vertex_list.draw.call_count == 4
+
+
+def test_instanced_shape_extend():
+    template = Shape.regular_polygon([0, 0], 1, 4, color=(10, 20, 30))
+    instances = InstancedShape(template)
+    for i in range(10):
+        instances.append([i, 0], scale=i)
+    instances.extend([[0, 1], [0, 2]], colors=[(1, 2, 3), (4, 5, 6)])
+    assert len(instances) == len(instances.instances) == 12
+    assert len(instances._buffer) >= 12
+    assert np.all(instances.positions[:10, 0] == np.arange(10))
+    assert np.all(instances.scales == list(range(10)) + [1, 1])
+    assert np.all(instances.colors[:10] == (10, 20, 30))
+    assert np.all(instances.colors[10:] == [(1, 2, 3), (4, 5, 6)])
+    instances.remove([0, 11])
+    assert len(instances) == 10
+    assert np.all(instances.positions[-1] == [0, 1])